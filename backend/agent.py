@@ -1,9 +1,21 @@
 import os
-from typing import Dict, Any, Optional, AsyncGenerator, List
+from typing import Dict, Any, Optional, AsyncGenerator, AsyncIterator, Awaitable, Iterator, List, Sequence
 from dotenv import load_dotenv
 import asyncio
-import json
-from llama_api_client import LlamaAPIClient
+import orjson
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+from types import MappingProxyType
+from llama_api_client import LlamaAPIClient, DefaultHttpxClient
+
+import memory
+from background import spawn
+from http_clients import HTTP2, HTTP_LIMITS, HTTP_TIMEOUT
 
 from tools import (
     get_network_status, 
@@ -23,8 +35,18 @@ from tools import (
 
 load_dotenv()
 
-# Initialize Llama API Client
-llm = LlamaAPIClient(api_key=os.getenv("LLAMA_API_KEY"))
+logger = logging.getLogger(__name__)
+
+# Initialize Llama API Client on a pooled connection that every request shares
+llm = LlamaAPIClient(
+    api_key=os.getenv("LLAMA_API_KEY"),
+    http_client=DefaultHttpxClient(http2=HTTP2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+)
+
+MODEL = "Llama-4-Maverick-17B-128E-Instruct-FP8"
+
+# chat.completions.create with the arguments every chat call shares
+create_completion = partial(llm.chat.completions.create, model=MODEL, max_completion_tokens=2048, temperature=0.6)
 
 # Tool definitions for Llama API
 TOOL_DEFINITIONS = [
@@ -351,6 +373,11 @@ TOOL_DEFINITIONS = [
 ]
 
 # Tool execution mapping
+# The tool schemas never change, so they are sent through extra_body, which the
+# client merges into the request as-is instead of re-walking them through its
+# TypedDict transform on every call
+TOOLS_BODY = MappingProxyType({"tools": TOOL_DEFINITIONS})
+
 TOOL_MAPPING = {
     "get_network_status": get_network_status,
     "get_node_details": get_node_details,
@@ -367,10 +394,7 @@ TOOL_MAPPING = {
     "rollback_device_configuration": rollback_device_configuration
 }
 
-def build_system_prompt(context: Optional[Dict[str, Any]] = None) -> str:
-    """Build context-aware system prompt"""
-    
-    system_prompt = """You are an expert network infrastructure assistant with real-time access to live network data. You help users manage and troubleshoot their network infrastructure using actual tools and data.
+_BASE_SYSTEM_PROMPT = """You are an expert network infrastructure assistant with real-time access to live network data. You help users manage and troubleshoot their network infrastructure using actual tools and data.
 
 You have access to the following tools:
 - get_network_status: Get status of network devices
@@ -395,212 +419,523 @@ For network configuration tasks, use the specialized network playbook tools:
 - Available devices: solo_r1 (router), solo_sw1/solo_sw2 (switches), solo_ub (server)
 
 IMPORTANT: Always use the appropriate tool when users ask for network status, logs, or device information. Never simulate or make up data."""
+
+@lru_cache(maxsize=512)
+def _build_context_prompt(stats: Optional[tuple], focus: Optional[tuple]) -> str:
+    """Build the live context lines from hashable context fields"""
+    parts = []
+    
+    if stats:
+        total_nodes, active, issues = stats
+        parts.append(f"Current network: {total_nodes} nodes, {active} active, {issues} with issues.")
+    
+    if focus:
+        label, node_type, status = focus
+        parts.append(f"User is focused on: {label} ({node_type}, Status: {status})")
+    
+    return "\n\n".join(parts)
+
+def context_messages(context: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+    """System message carrying the live network context, if any
+    
+    Kept apart from _BASE_SYSTEM_PROMPT so the static prompt is a byte-stable
+    prefix that the provider can serve from its prompt cache on every turn.
+    """
+    if not context:
+        return []
+    
+    stats = context.get("network_stats")
+    node = context.get("focused_node")
+    
+    stats_key = (stats.get('total_nodes', 0), stats.get('active', 0), stats.get('issues', 0)) if stats else None
+    focus_key = (node.get('label', 'Unknown'), node.get('type', 'Unknown'), node.get('status', 'Unknown')) if node else None
+    
+    content = _build_context_prompt(stats_key, focus_key)
+    return [{"role": "system", "content": content}] if content else []
+
+# Replayed history grows from HISTORY_WINDOW up to HISTORY_WINDOW + HISTORY_SLACK
+# messages before resetting, so consecutive turns resend the previous prefix
+# unchanged. Messages that fall out of the window are folded into a running summary.
+ROLLING_SUMMARY = os.getenv("ROLLING_SUMMARY", "false").lower() in ("1", "true", "yes")
+
+if ROLLING_SUMMARY:
+    # Keep only the last exchange verbatim and fold older turns into the
+    # summary every ROLLING_SUMMARY_TURNS turns
+    HISTORY_WINDOW = 2
+    HISTORY_SLACK = 2 * int(os.getenv("ROLLING_SUMMARY_TURNS", "3"))
+else:
+    HISTORY_WINDOW = 12
+    HISTORY_SLACK = HISTORY_WINDOW
+
+# Hard cap on how much incoming history is considered at all
+MAX_HISTORY_MESSAGES = 64
+
+# Tools whose string output is shown to the user as-is (tool name -> template)
+# instead of being summarized by a follow-up generation
+DIRECT_OUTPUT_TOOLS = {
+    "create_ansible_playbook": "Here is the generated Ansible playbook:\n\n```yaml\n{output}\n```"
+}
+
+# Roles replayed from conversation history
+_ALLOWED_ROLES = frozenset(("user", "assistant"))
+
+# session_id -> history window replayed on the session's previous turn, least
+# recently used sessions evicted beyond memory.MAX_CACHED_SESSIONS
+_windows: "OrderedDict[str, List[Dict[str, str]]]" = OrderedDict()
+
+def _find_window(conversation_history: List[Dict[str, str]], window: List[Dict[str, str]]) -> Optional[int]:
+    """Index where the previous window starts, matching it as a whole run
+    
+    History only grows at the end, so the run nearest the end is the one the
+    previous turn saw; matching every message rather than a single anchor
+    keeps repeated short messages ("yes", "status?") from moving the start.
+    """
+    size = len(window)
+    for start in range(len(conversation_history) - size, -1, -1):
+        if conversation_history[start] == window[0] and conversation_history[start:start + size] == window:
+            return start
+    return None
+
+def history_window(conversation_history: Optional[Sequence[Dict[str, str]]], session_id: Optional[str] = None) -> List[Dict[str, str]]:
+    """Select the history messages to replay, keeping the prefix stable across turns"""
+    if not conversation_history:
+        return []
+    
+    # Only the tail is ever used, so bound the work (and the copy) regardless
+    # of how long the caller's history is; accepts lists and deques alike
+    if session_id is None:
+        return list(islice(conversation_history, max(len(conversation_history) - HISTORY_WINDOW, 0), None))
+    
+    conversation_history = list(islice(conversation_history, max(len(conversation_history) - MAX_HISTORY_MESSAGES, 0), None))
     
-    if context and context.get("network_stats"):
-        stats = context["network_stats"]
-        system_prompt += f"\n\nCurrent network: {stats.get('total_nodes', 0)} nodes, {stats.get('active', 0)} active, {stats.get('issues', 0)} with issues."
+    start = None
+    previous = _windows.get(session_id)
+    if previous is not None:
+        start = _find_window(conversation_history, previous)
     
-    if context and context.get("focused_node"):
-        node = context["focused_node"]
-        system_prompt += f"\n\nUser is focused on: {node.get('label', 'Unknown')} ({node.get('type', 'Unknown')}, Status: {node.get('status', 'Unknown')})"
+    if start is None or len(conversation_history) - start >= HISTORY_WINDOW + HISTORY_SLACK:
+        new_start = max(len(conversation_history) - HISTORY_WINDOW, 0)
+        dropped = conversation_history[start or 0:new_start]
+        if dropped:
+            spawn(memory.update_summary(session_id, dropped))
+        start = new_start
     
-    return system_prompt
+    window = conversation_history[start:]
+    _windows[session_id] = window
+    _windows.move_to_end(session_id)
+    if len(_windows) > memory.MAX_CACHED_SESSIONS:
+        _windows.popitem(last=False)
+    return window
+
+def history_messages(conversation_history: Optional[Sequence[Dict[str, str]]], session_id: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """Role/content messages for the history window, skipping other roles"""
+    for hist_msg in history_window(conversation_history, session_id):
+        role = hist_msg.get("role")
+        if role in _ALLOWED_ROLES:
+            yield {"role": role, "content": hist_msg["content"]}
+
+def summary_messages(session_id: Optional[str]) -> List[Dict[str, str]]:
+    """System message carrying the summary of history outside the window, if any"""
+    summary = memory.get_summary(session_id) if session_id else None
+    if not summary:
+        return []
+    return [{"role": "system", "content": f"Prior conversation summary: {summary}"}]
+
+# Fallback parser for models that write tool calls as text: [func(key="value", ...)]
+_TEXT_CALL_RE = re.compile(r'\[(\w+)\((.*?)\)\]')
+_ARG_QUOTED_RE = re.compile(r'(\w+)=(["\'])(.*?)\2')
+_ARG_UNQUOTED_RE = re.compile(r'(\w+)=([^,\)]+)')
+
+@lru_cache(maxsize=256)
+def parse_text_call_args(args_str: str) -> tuple:
+    """Parse key="value" (or unquoted key=value) pairs from a text tool call"""
+    pairs = [(key, value) for key, _, value in _ARG_QUOTED_RE.findall(args_str)]
+    if not pairs:
+        pairs = _ARG_UNQUOTED_RE.findall(args_str)
+    return tuple((key, value.strip()) for key, value in pairs)
+
+# Dedicated pool for blocking tools (SSH, Ansible, HTTP), so long-running tool
+# calls neither block the event loop nor exhaust the default executor
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="tool")
+
+def _make_dispatch(tool_func):
+    """Resolve once whether a tool is awaited directly or run in the tool pool"""
+    if asyncio.iscoroutinefunction(tool_func):
+        return lambda args: tool_func(**args)
+    return lambda args: asyncio.get_running_loop().run_in_executor(TOOL_EXECUTOR, partial(tool_func, **args))
+
+# tool name -> callable taking the args dict and returning an awaitable
+_DISPATCH = {name: _make_dispatch(tool_func) for name, tool_func in TOOL_MAPPING.items()}
 
 async def execute_tool(tool_name: str, args: Dict[str, Any]) -> Any:
     """Execute a tool by name with given arguments"""
     
-    print(f"=== EXECUTE_TOOL DEBUG ===")
-    print(f"tool_name: {tool_name}")
-    print(f"args: {args}")
+    logger.debug("Executing tool %s with args %r", tool_name, args)
     
-    if tool_name not in TOOL_MAPPING:
+    dispatch = _DISPATCH.get(tool_name)
+    if dispatch is None:
         raise ValueError(f"Unknown tool: {tool_name}")
     
-    tool_func = TOOL_MAPPING[tool_name]
-    print(f"tool_func: {tool_func}")
-    print(f"has ainvoke: {hasattr(tool_func, 'ainvoke')}")
-    print(f"has invoke: {hasattr(tool_func, 'invoke')}")
-    print(f"is coroutine: {asyncio.iscoroutinefunction(tool_func)}")
+    return await dispatch(args)
+
+# Trivial requests that map straight onto one tool skip the LLM round trips.
+# Patterns are anchored so anything with more to it still goes to the model.
+INTENT_ROUTING = os.getenv("INTENT_ROUTING", "true").lower() not in ("0", "false", "no")
+
+_DEVICE = r"([\w.\-]+)"
+INTENTS = [
+    (
+        re.compile(r"(?:show|get|check|what(?:'s| is))?\s*(?:me\s+)?(?:the\s+)?(?:current\s+)?network\s+status\??", re.IGNORECASE),
+        "get_network_status",
+        lambda match: {}
+    ),
+    (
+        re.compile(r"(?:show|get|check)\s+(?:me\s+)?(?:the\s+)?status\s+(?:of|for)\s+" + _DEVICE + r"\??", re.IGNORECASE),
+        "get_network_status",
+        lambda match: {"node_name": match.group(1)}
+    ),
+    (
+        re.compile(r"(?:show|get)\s+(?:me\s+)?(?:the\s+)?(?:recent\s+)?error\s+logs?", re.IGNORECASE),
+        "get_error_logs",
+        lambda match: {}
+    ),
+    (
+        re.compile(r"(?:show|get)\s+(?:me\s+)?(?:the\s+)?(?:recent\s+)?logs?\s+(?:for|from|of)\s+" + _DEVICE, re.IGNORECASE),
+        "get_recent_logs",
+        lambda match: {"device_name": match.group(1)}
+    ),
+]
+
+def format_network_status(status: Dict[str, Any]) -> str:
+    """Render a get_network_status result as readable text"""
+    if "error" in status:
+        return status["error"]
+    if "node" in status:
+        lines = [f"**{status['node']}** ({status['type']}) is {status['status']}"]
+        if status.get("ip_address"):
+            lines.append(f"- IP address: {status['ip_address']}")
+        if status.get("last_seen"):
+            lines.append(f"- Last seen: {status['last_seen']}")
+        return "\n".join(lines)
+    lines = [f"{status['total_nodes']} nodes: {status['active']} active, {status['inactive']} inactive"]
+    lines.extend(
+        f"- **{node['name']}** ({node['type']}): {node['status']}"
+        + (f", {node['ip_address']}" if node.get("ip_address") else "")
+        for node in status["nodes"]
+    )
+    return "\n".join(lines)
+
+# Routed tools that return structured data need rendering before it is shown;
+# log tools already return readable text
+INTENT_FORMATTERS = {
+    "get_network_status": format_network_status,
+}
+
+def match_intent(message: str) -> Optional[tuple]:
+    """Return (tool_name, args) for a message that needs exactly one tool call"""
+    text = message.strip()
+    for pattern, tool_name, extract_args in INTENTS:
+        match = pattern.fullmatch(text)
+        if match:
+            return tool_name, extract_args(match)
+    return None
+
+_STREAM_END = object()
+
+async def aiter_sync(iterator) -> AsyncIterator:
+    """Consume a blocking iterator (such as a llama_api_client stream) on a
+    worker thread, so the event loop keeps serving other requests meanwhile"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed
+            pass
     
-    # Since we removed langchain decorators, call functions directly
-    if asyncio.iscoroutinefunction(tool_func):
-        print(f"Calling async function with **args: {args}")
-        return await tool_func(**args)
-    else:
-        print(f"Calling sync function with **args: {args}")
-        return tool_func(**args)
+    def pump():
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                put((item, None))
+        except Exception as e:
+            put((None, e))
+        finally:
+            put(_STREAM_END)
+    
+    pump_future = loop.run_in_executor(None, pump)
+    try:
+        while True:
+            entry = await queue.get()
+            if entry is _STREAM_END:
+                break
+            item, error = entry
+            if error is not None:
+                raise error
+            yield item
+    finally:
+        stop.set()
+        if not pump_future.done() and hasattr(iterator, "close"):
+            iterator.close()
+
+async def stream_text(messages: List[Dict[str, Any]]) -> AsyncGenerator[Dict[str, Any], None]:
+    """Stream a plain (tool-free) completion as text events"""
+    response = await asyncio.to_thread(
+        create_completion,
+        messages=messages,
+        stream=True
+    )
+    
+    async for chunk in aiter_sync(response):
+        event = getattr(chunk, 'event', None)
+        delta = getattr(event, 'delta', None) if event else None
+        text = getattr(delta, 'text', None) if delta else None
+        if text:
+            yield {"type": "text", "content": text}
+
+async def _tool_outcome(tool_call_id: str, execution: asyncio.Future) -> tuple:
+    try:
+        return tool_call_id, await execution, None
+    except Exception as e:
+        return tool_call_id, None, e
+
+def run_tool_calls(calls: List[tuple]) -> List[Awaitable[tuple]]:
+    """Start (tool_call_id, tool_name, args) calls concurrently.
+    
+    Returns one awaitable per call resolving to (tool_call_id, result, error),
+    so results can be matched up as they complete. Identical calls within the
+    same turn share a single execution.
+    """
+    executions = {}
+    outcomes = []
+    for tool_call_id, tool_name, args in calls:
+        key = (tool_name, orjson.dumps(args, default=str, option=orjson.OPT_SORT_KEYS))
+        execution = executions.get(key)
+        if execution is None:
+            execution = executions[key] = asyncio.ensure_future(execute_tool(tool_name, args))
+        outcomes.append(_tool_outcome(tool_call_id, execution))
+    return outcomes
 
 async def agent_streaming_chat(
     message: str, 
     context: Optional[Dict[str, Any]] = None, 
-    conversation_history: Optional[List[Dict[str, str]]] = None
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    session_id: Optional[str] = None,
+    intent_routing: bool = True
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """Main agent chat function using Llama API with proper tool calling"""
     
     try:
+        intent = match_intent(message) if intent_routing and INTENT_ROUTING else None
+        if intent:
+            tool_name, args = intent
+            logger.debug("Routing %r straight to %s", message, tool_name)
+            yield {"type": "text", "content": f"Running {tool_name}...\n\n"}
+            yield {"type": "tool_call", "toolCallId": "call_1", "toolName": tool_name, "args": args}
+            try:
+                result = await execute_tool(tool_name, args)
+            except Exception as e:
+                logger.warning("Tool execution error: %s", e)
+                yield {"type": "tool_error", "toolCallId": "call_1", "error": str(e)}
+            else:
+                yield {"type": "tool_result", "toolCallId": "call_1", "result": result}
+                formatter = INTENT_FORMATTERS.get(tool_name)
+                yield {"type": "text", "content": formatter(result) if formatter else str(result)}
+            yield {"type": "done"}
+            return
+        
         # Build messages
-        messages = [{"role": "system", "content": build_system_prompt(context)}]
+        messages = [{"role": "system", "content": _BASE_SYSTEM_PROMPT}]
+        messages.extend(summary_messages(session_id))
         
         # Add conversation history
-        if conversation_history:
-            for hist_msg in conversation_history[-10:]:  # Keep last 10 messages
-                if hist_msg.get("role") in ["user", "assistant"]:
-                    messages.append({
-                        "role": hist_msg["role"],
-                        "content": hist_msg["content"]
-                    })
+        messages.extend(history_messages(conversation_history, session_id))
         
-        # Add current message
+        # Live context changes from turn to turn, so it goes after the
+        # cacheable prefix, right before the current message
+        messages.extend(context_messages(context))
         messages.append({"role": "user", "content": message})
         
-        # First call to detect tool calls (non-streaming)
+        # Single streaming call with tools enabled: plain text is forwarded as it
+        # arrives, tool-call deltas are accumulated and executed once complete
         tool_calls = []
-        completion_message = None
+        streamed_text = False
+        hold_text = None
+        # Text-form calls are picked up as each "[name(...)]" span closes, so
+        # the accumulated text is never rescanned from the start
+        content_text = ""
+        scan_pos = 0
+        matches = []
         
         try:
-            print("Making initial call to detect tool calls...")
-            response = llm.chat.completions.create(
-                model="Llama-4-Maverick-17B-128E-Instruct-FP8",
+            logger.debug("Making streaming call with tools")
+            response = await asyncio.to_thread(
+                create_completion,
                 messages=messages,
-                tools=TOOL_DEFINITIONS,
-                max_completion_tokens=2048,
-                temperature=0.6,
-                stream=False
+                extra_body=TOOLS_BODY,
+                stream=True
             )
             
-            # Extract completion message
-            completion_message = response.completion_message.model_dump()
+            async for chunk in aiter_sync(response):
+                delta = chunk.event.delta
+                if delta.type == "tool_call":
+                    # A delta with a new id starts a call; later fragments extend it
+                    if not tool_calls or (delta.id and delta.id != tool_calls[-1]["id"]):
+                        tool_calls.append({
+                            "id": delta.id or f"call_{len(tool_calls) + 1}",
+                            "function": {"name": "", "arguments": ""}
+                        })
+                    function = tool_calls[-1]["function"]
+                    function["name"] += delta.function.name or ""
+                    function["arguments"] += delta.function.arguments or ""
+                elif delta.text:
+                    content_text += delta.text
+                    if "]" in delta.text:
+                        for match in _TEXT_CALL_RE.finditer(content_text, scan_pos):
+                            matches.append(match.groups())
+                            scan_pos = match.end()
+                    if hold_text is None:
+                        # Everything before this delta was blank, so only the
+                        # delta itself needs checking
+                        leading = delta.text.lstrip()
+                        if not leading:
+                            continue
+                        # Text that opens with "[" may be a text-form tool call,
+                        # so keep it back until the whole response is in
+                        hold_text = leading.startswith("[")
+                        if not hold_text:
+                            streamed_text = True
+                            yield {"type": "text", "content": content_text}
+                    elif not hold_text and not tool_calls:
+                        yield {"type": "text", "content": delta.text}
+            
+            completion_message = {"role": "assistant", "content": content_text}
+            if tool_calls:
+                completion_message["tool_calls"] = tool_calls
             
             # Check for tool calls in the response
-            if completion_message.get("tool_calls"):
-                tool_calls = completion_message["tool_calls"]
-                print(f"Found {len(tool_calls)} tool calls: {tool_calls}")
+            if tool_calls:
+                logger.debug("Found %d tool calls: %s", len(tool_calls), tool_calls)
                 
-                # Execute tool calls
+                # Announce every call up front, then run them concurrently and
+                # report results as they finish
+                requested = []
                 for tool_call in tool_calls:
                     try:
                         # Parse arguments
-                        args = json.loads(tool_call["function"]["arguments"]) if tool_call["function"]["arguments"] else {}
-                        
-                        # Notify about tool execution
-                        yield {
-                            "type": "tool_call",
-                            "toolCallId": tool_call["id"],
-                            "toolName": tool_call["function"]["name"],
-                            "args": args
-                        }
-                        
-                        # Execute tool
-                        result = await execute_tool(tool_call["function"]["name"], args)
-                        
-                        # Return tool result
-                        yield {
-                            "type": "tool_result",
-                            "toolCallId": tool_call["id"],
-                            "result": result
-                        }
-                        
-                        # Add tool result to messages for next turn
-                        messages.append(completion_message)
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call["id"],
-                            "content": str(result)
-                        })
-                        
+                        args = orjson.loads(tool_call["function"]["arguments"] or "{}")
                     except Exception as e:
-                        print(f"Tool execution error: {e}")
+                        logger.warning("Tool argument parsing error: %s", e)
                         yield {
                             "type": "tool_error",
                             "toolCallId": tool_call["id"],
                             "error": str(e)
                         }
-            
-            # Check if the response contains text that looks like function calls (fallback parsing)
-            elif completion_message.get("content"):
-                content = completion_message["content"]
-                if isinstance(content, dict) and content.get("text"):
-                    content_text = content["text"]
-                elif isinstance(content, str):
-                    content_text = content
-                else:
-                    content_text = str(content)
+                        continue
+                    
+                    # Notify about tool execution
+                    yield {
+                        "type": "tool_call",
+                        "toolCallId": tool_call["id"],
+                        "toolName": tool_call["function"]["name"],
+                        "args": args
+                    }
+                    requested.append((tool_call["id"], tool_call["function"]["name"], args))
                 
-                # Try to parse function calls from text content
-                import re
-                function_pattern = r'\[(\w+)\((.*?)\)\]'
-                matches = re.findall(function_pattern, content_text)
+                # The assistant turn that requested the tools precedes their results
+                messages.append(completion_message)
                 
-                if matches:
-                    print(f"Found {len(matches)} function calls in text: {matches}")
+                for finished in asyncio.as_completed(run_tool_calls(requested)):
+                    tool_call_id, result, error = await finished
+                    if error is not None:
+                        logger.warning("Tool execution error: %s", error)
+                        yield {
+                            "type": "tool_error",
+                            "toolCallId": tool_call_id,
+                            "error": str(error)
+                        }
+                        continue
+                    
+                    # Return tool result
+                    yield {
+                        "type": "tool_result",
+                        "toolCallId": tool_call_id,
+                        "result": result
+                    }
                     
-                    # Store tool results for building context
-                    tool_results = []
+                    # Add tool result to messages for next turn
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call_id,
+                        "content": orjson.dumps(result, default=str).decode() if isinstance(result, (dict, list)) else str(result)
+                    })
+            
+            # Check if the response contains text that looks like function calls (fallback parsing)
+            elif content_text.strip():
+                # Function calls found in the text while it streamed
+                if matches:
+                    logger.debug("Found %d function calls in text: %s", len(matches), matches)
                     
+                    # Announce every call up front, then run them concurrently and
+                    # report results as they finish
+                    calls = {}
+                    requested = []
                     for i, (func_name, args_str) in enumerate(matches):
                         if func_name in TOOL_MAPPING:
-                            try:
-                                # Parse arguments from string
-                                args = {}
-                                if args_str:
-                                    print(f"Parsing arguments from: '{args_str}'")
-                                    
-                                    # Try multiple patterns for parsing arguments
-                                    # Pattern 1: key="value" or key='value'
-                                    arg_pairs = re.findall(r'(\w+)=(["\'])(.*?)\2', args_str)
-                                    print(f"Found quoted argument pairs: {arg_pairs}")
-                                    
-                                    # Pattern 2: key=value (without quotes)
-                                    if not arg_pairs:
-                                        arg_pairs = re.findall(r'(\w+)=([^,\)]+)', args_str)
-                                        print(f"Found unquoted argument pairs: {arg_pairs}")
-                                        # Convert to same format as quoted pairs
-                                        arg_pairs = [(key, '', value.strip()) for key, value in arg_pairs]
-                                    
-                                    for key, _, value in arg_pairs:
-                                        args[key] = value.strip()
-                                    print(f"Parsed args: {args}")
-                                
-                                tool_call_id = f"call_{i+1}"
-                                
-                                # Notify about tool execution
-                                yield {
-                                    "type": "tool_call",
-                                    "toolCallId": tool_call_id,
-                                    "toolName": func_name,
-                                    "args": args
-                                }
-                                
-                                # Execute tool
-                                print(f"About to execute tool {func_name} with args {args}")
-                                result = await execute_tool(func_name, args)
-                                print(f"Tool {func_name} completed successfully, result length: {len(str(result))}")
-                                if isinstance(result, dict) and not result.get("success", True):
-                                    print(f"Tool result (FAILED): {result}")
-                                else:
-                                    print(f"Tool result preview: {str(result)[:200]}...")
-                                
-                                # Store result for context
-                                tool_results.append({
-                                    "function": func_name,
-                                    "args": args,
-                                    "result": result
-                                })
-                                
-                                # Return tool result
-                                yield {
-                                    "type": "tool_result",
-                                    "toolCallId": tool_call_id,
-                                    "result": result
-                                }
-                                
-                            except Exception as e:
-                                print(f"Tool execution error for {func_name}: {e}")
-                                yield {
-                                    "type": "tool_error",
-                                    "toolCallId": f"call_{i+1}",
-                                    "error": str(e)
-                                }
+                            # Parse arguments from string
+                            args = dict(parse_text_call_args(args_str)) if args_str else {}
+                            logger.debug("Parsed args from %r: %s", args_str, args)
+                            
+                            tool_call_id = f"call_{i+1}"
+                            calls[tool_call_id] = (func_name, args)
+                            
+                            # Notify about tool execution
+                            yield {
+                                "type": "tool_call",
+                                "toolCallId": tool_call_id,
+                                "toolName": func_name,
+                                "args": args
+                            }
+                            requested.append((tool_call_id, func_name, args))
+                    
+                    results = {}
+                    for finished in asyncio.as_completed(run_tool_calls(requested)):
+                        tool_call_id, result, error = await finished
+                        func_name = calls[tool_call_id][0]
+                        if error is not None:
+                            logger.warning("Tool execution error for %s: %s", func_name, error)
+                            yield {
+                                "type": "tool_error",
+                                "toolCallId": tool_call_id,
+                                "error": str(error)
+                            }
+                            continue
+                        
+                        # Stringify once; the preview and summary only slice it
+                        result_text = result if isinstance(result, str) else orjson.dumps(result, default=str).decode()
+                        if isinstance(result, dict) and not result.get("success", True):
+                            logger.warning("Tool %s failed: %s", func_name, result_text)
+                        else:
+                            logger.debug("Tool %s result preview: %.200s", func_name, result_text)
+                        results[tool_call_id] = (result, result_text)
+                        
+                        # Return tool result
+                        yield {
+                            "type": "tool_result",
+                            "toolCallId": tool_call_id,
+                            "result": result
+                        }
+                    
+                    # Store results for context in the order the model asked for them
+                    tool_results = [
+                        {"function": func_name, "args": args, "result": results[tool_call_id][0], "result_text": results[tool_call_id][1]}
+                        for tool_call_id, (func_name, args) in calls.items()
+                        if tool_call_id in results
+                    ]
                     
                     # After executing parsed tool calls, generate a follow-up response with tool results
                     if tool_results:
@@ -611,191 +946,187 @@ async def agent_streaming_chat(
                             
                             if is_config_request:
                                 # For configuration tools, show the raw ansible output
-                                print("=== CONFIG REQUEST DETECTED ===")
                                 for tr in tool_results:
                                     if tr['function'] in config_tools and isinstance(tr['result'], dict):
                                         result = tr['result']
-                                        print(f"Processing result for {tr['function']}: success={result.get('success')}")
-                                        print(f"Has ansible_output: {'ansible_output' in result}")
-                                        
                                         if result.get('success') and 'ansible_output' in result:
                                             # Return the raw ansible output formatted for the UI
                                             ansible_output = result['ansible_output']
                                             device_name = tr['args'].get('device_name', tr['args'].get('target_device', 'device'))
                                             
-                                            formatted_output = f"# Configuration Retrieved from {device_name}\n\n"
-                                            formatted_output += "## Ansible Execution Output\n\n"
-                                            formatted_output += f"```\n{ansible_output}\n```\n\n"
+                                            output_parts = [
+                                                f"# Configuration Retrieved from {device_name}\n\n",
+                                                "## Ansible Execution Output\n\n",
+                                                f"```\n{ansible_output}\n```\n\n"
+                                            ]
                                             
                                             # Also show extracted config data if available
                                             if 'configuration_data' in result and result['configuration_data']:
-                                                formatted_output += "## Extracted Configuration Data\n\n"
+                                                output_parts.append("## Extracted Configuration Data\n\n")
                                                 config_data = result['configuration_data']
-                                                for key, value in config_data.items():
-                                                    formatted_output += f"### {key.replace('_', ' ').title()}\n```\n{value}\n```\n\n"
-                                            
-                                            print(f"=== SENDING CONFIG RESPONSE (length: {len(formatted_output)}) ===")
+                                                output_parts.extend(
+                                                    f"### {key.replace('_', ' ').title()}\n```\n{value}\n```\n\n"
+                                                    for key, value in config_data.items()
+                                                )
                                             
                                             # Send the formatted output
                                             yield {
                                                 "type": "content", 
-                                                "text": formatted_output
+                                                "text": "".join(output_parts)
                                             }
                                             return
                                         else:
-                                            print(f"Config tool failed or missing ansible_output: {result}")
+                                            logger.warning("Config tool %s failed or missing ansible_output", tr['function'])
                                 
-                                print("=== NO VALID CONFIG RESULTS FOUND ===")
                                 # Fall through to standard processing if no valid config results
                             
-                            # For non-config tools, use the standard LLM follow-up
-                            # Build context message with tool results
-                            results_summary = "Tool execution results:\n"
-                            for tr in tool_results:
-                                results_summary += f"- {tr['function']}({tr['args']}): {str(tr['result'])[:200]}...\n"
-                            
-                            follow_up_messages = messages + [
-                                {"role": "assistant", "content": content_text},
-                                {"role": "user", "content": f"Based on the tool execution results below, please provide a clear summary and analysis:\n\n{results_summary}"}
-                            ]
-                            
-                            follow_up_response = llm.chat.completions.create(
-                                model="Llama-4-Maverick-17B-128E-Instruct-FP8",
-                                messages=follow_up_messages,
-                                max_completion_tokens=2048,
-                                temperature=0.6,
-                                stream=True
-                            )
+                            # Tools that already return user-ready text need no
+                            # second generation; show their output directly
+                            if all(tr['function'] in DIRECT_OUTPUT_TOOLS and isinstance(tr['result'], str) for tr in tool_results):
+                                yield {
+                                    "type": "text",
+                                    "content": "\n\n".join(DIRECT_OUTPUT_TOOLS[tr['function']].format(output=tr['result']) for tr in tool_results)
+                                }
+                            else:
+                                # For non-config tools, use the standard LLM follow-up
+                                # Build context message with tool results
+                                results_summary = "Tool execution results:\n" + "".join(
+                                    f"- {tr['function']}({tr['args']}): {tr['result_text'][:200]}...\n"
+                                    for tr in tool_results
+                                )
+                                
+                                follow_up_messages = messages + [
+                                    {"role": "assistant", "content": content_text},
+                                    {"role": "user", "content": f"Based on the tool execution results below, please provide a clear summary and analysis:\n\n{results_summary}"}
+                                ]
+                                
+                                # Stream the follow-up response
+                                async for event in stream_text(follow_up_messages):
+                                    yield event
                             
-                            # Stream the follow-up response
-                            for chunk in follow_up_response:
-                                if hasattr(chunk, 'event') and chunk.event:
-                                    if hasattr(chunk.event, 'delta') and chunk.event.delta:
-                                        if hasattr(chunk.event.delta, 'text') and chunk.event.delta.text:
-                                            yield {"type": "text", "content": chunk.event.delta.text}
-                                            
                         except Exception as follow_error:
-                            print(f"Follow-up response failed: {follow_error}")
+                            logger.warning("Follow-up response failed: %s", follow_error)
                             # Provide a basic summary of the tool results
-                            summary = f"Successfully executed {len(tool_results)} tool(s):\n"
-                            for tr in tool_results:
-                                summary += f"• {tr['function']}: Retrieved data successfully\n"
+                            summary = f"Successfully executed {len(tool_results)} tool(s):\n" + "".join(
+                                f"• {tr['function']}: Retrieved data successfully\n"
+                                for tr in tool_results
+                            )
                             yield {"type": "text", "content": summary}
-                else:
-                    # No function calls found, return the original content
+                elif hold_text:
+                    # No function calls found, return the held back content
                     yield {"type": "text", "content": content_text}
                     
             else:
-                # No tool calls, stream the original response
-                if completion_message.get("content"):
-                    # If we have content from the non-streaming call, yield it
-                    content = completion_message["content"]
-                    if isinstance(content, dict) and content.get("text"):
-                        yield {"type": "text", "content": content["text"]}
-                    elif isinstance(content, str):
-                        yield {"type": "text", "content": content}
-                else:
-                    # Fallback to streaming without tools
-                    try:
-                        streaming_response = llm.chat.completions.create(
-                            model="Llama-4-Maverick-17B-128E-Instruct-FP8",
-                            messages=messages,
-                            max_completion_tokens=2048,
-                            temperature=0.6,
-                            stream=True
-                        )
-                        
-                        for chunk in streaming_response:
-                            if hasattr(chunk, 'event') and chunk.event:
-                                if hasattr(chunk.event, 'delta') and chunk.event.delta:
-                                    if hasattr(chunk.event.delta, 'text') and chunk.event.delta.text:
-                                        yield {"type": "text", "content": chunk.event.delta.text}
-                                        
-                    except Exception as streaming_error:
-                        print(f"Streaming fallback failed: {streaming_error}")
-                        yield {"type": "text", "content": "I'm having trouble generating a response. Please try again."}
-                        
+                # No text and no tool calls: retry as plain streaming without tools
+                try:
+                    async for event in stream_text(messages):
+                        yield event
+                
+                except Exception as streaming_error:
+                    logger.warning("Streaming fallback failed: %s", streaming_error)
+                    yield {"type": "text", "content": "I'm having trouble generating a response. Please try again."}
+        
         except Exception as api_error:
-            print(f"API call failed: {api_error}")
-            # Fallback to simple streaming without tools
-            try:
-                fallback_response = llm.chat.completions.create(
-                    model="Llama-4-Maverick-17B-128E-Instruct-FP8",
-                    messages=messages,
-                    max_completion_tokens=2048,
-                    temperature=0.6,
-                    stream=True
-                )
+            logger.warning("API call failed: %s", api_error)
+            if streamed_text:
+                # Part of the answer already reached the client, so don't start over
+                yield {"type": "error", "error": "Response was interrupted"}
+            else:
+                # Fallback to simple streaming without tools
+                try:
+                    async for event in stream_text(messages):
+                        yield event
                 
-                for chunk in fallback_response:
-                    if hasattr(chunk, 'event') and chunk.event:
-                        if hasattr(chunk.event, 'delta') and chunk.event.delta:
-                            if hasattr(chunk.event.delta, 'text') and chunk.event.delta.text:
-                                yield {"type": "text", "content": chunk.event.delta.text}
-                                
-            except Exception as fallback_error:
-                print(f"Fallback failed: {fallback_error}")
-                yield {"type": "error", "error": "Unable to generate response"}
+                except Exception as fallback_error:
+                    logger.error("Fallback failed: %s", fallback_error)
+                    yield {"type": "error", "error": "Unable to generate response"}
         
         yield {"type": "done"}
         
     except Exception as e:
-        print(f"Error in agent streaming chat: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Agent streaming chat failed")
         yield {"type": "error", "error": str(e)}
 
+async def warm_up():
+    """Open the API connection ahead of the first chat request
+    
+    Listing models is free and completes the TLS handshake, leaving a pooled
+    connection for the first completion to reuse.
+    """
+    try:
+        await asyncio.to_thread(llm.models.list)
+    except Exception as e:
+        logger.warning("Llama API warm-up failed: %s", e)
+
+def close_clients():
+    """Close the pooled HTTP client on shutdown"""
+    llm.close()
+
 # Backward compatibility functions
 def create_agent():
-    """Legacy function for compatibility"""
-    return None
+    """Shared LangGraph ReAct agent with async tools, for the non-streaming /chat endpoint"""
+    from enhanced_agent import get_react_agent, ALL_TOOL_NAMES
+    return get_react_agent(ALL_TOOL_NAMES)
 
 def create_streaming_agent(context: Optional[Dict[str, Any]] = None):
-    """Legacy function for compatibility"""
-    return None
+    """Same shared ReAct agent; context only affects the system prompt, which
+    callers build separately, so it does not change the graph"""
+    return create_agent()
 
 async def simple_streaming_chat(
     message: str, 
     context: Optional[Dict[str, Any]] = None, 
-    conversation_history: Optional[List[Dict[str, str]]] = None
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    session_id: Optional[str] = None
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """Fallback simple chat without tools"""
     
-    messages = [{"role": "system", "content": build_system_prompt(context)}]
+    messages = [{"role": "system", "content": _BASE_SYSTEM_PROMPT}]
+    messages.extend(summary_messages(session_id))
     
-    if conversation_history:
-        for hist_msg in conversation_history[-10:]:
-            if hist_msg.get("role") in ["user", "assistant"]:
-                messages.append({
-                    "role": hist_msg["role"],
-                    "content": hist_msg["content"]
-                })
+    # Prefer a short block of remembered facts over replaying raw history;
+    # sessions with nothing extracted yet still get the history window
+    facts = memory.retrieve(session_id, message) if session_id else []
+    if facts:
+        messages.append({
+            "role": "system",
+            "content": "Relevant facts from earlier in this conversation:\n" + "\n".join(f"- {fact}" for fact in facts)
+        })
+    else:
+        messages.extend(history_messages(conversation_history, session_id))
     
+    messages.extend(context_messages(context))
     messages.append({"role": "user", "content": message})
     
-    response = llm.chat.completions.create(
-        model="Llama-4-Maverick-17B-128E-Instruct-FP8",
+    response = await asyncio.to_thread(
+        create_completion,
         messages=messages,
-        stream=True,
-        temperature=0.6
+        stream=True
     )
     
-    for chunk in response:
+    response_parts = []
+    async for chunk in aiter_sync(response):
+        text = None
         # Handle llama-api-client specific structure
-        if hasattr(chunk, 'event') and chunk.event:
-            event = chunk.event
-            if hasattr(event, 'delta') and event.delta and hasattr(event.delta, 'text'):
-                text = event.delta.text
-                if text:
-                    yield {"type": "text", "content": text}
+        event = getattr(chunk, 'event', None)
+        if event:
+            delta = getattr(event, 'delta', None)
+            text = getattr(delta, 'text', None) if delta else None
         # Fallback to other structures
-        elif hasattr(chunk, 'choices') and chunk.choices and len(chunk.choices) > 0:
-            choice = chunk.choices[0]
-            if hasattr(choice, 'delta') and hasattr(choice.delta, 'content') and choice.delta.content:
-                yield {"type": "text", "content": choice.delta.content}
-        elif hasattr(chunk, 'content') and chunk.content:
-            yield {"type": "text", "content": chunk.content}
-        elif isinstance(chunk, dict) and 'content' in chunk and chunk['content']:
-            yield {"type": "text", "content": chunk['content']}
+        elif getattr(chunk, 'choices', None):
+            delta = getattr(chunk.choices[0], 'delta', None)
+            text = getattr(delta, 'content', None) if delta else None
+        elif isinstance(chunk, dict):
+            text = chunk.get('content')
+        else:
+            text = getattr(chunk, 'content', None)
+        
+        if text:
+            response_parts.append(text)
+            yield {"type": "text", "content": text}
+    
+    # Extract facts from this turn in the background for later retrieval
+    if session_id and response_parts:
+        spawn(memory.remember(session_id, message, "".join(response_parts)))
     
     yield {"type": "done"}
\ No newline at end of file
@@ -1,23 +1,35 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Dict, Any, Optional, List, AsyncGenerator
-from datetime import datetime
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+from typing import Dict, Any, Optional, List, Union, AsyncGenerator, AsyncIterator
+from datetime import datetime, UTC
 import uvicorn
-import json
+import orjson
 import asyncio
+import heapq
+import re
+import logging
 from uuid import uuid4
+from itertools import chain, count, islice, repeat
+from functools import partial
+from collections import OrderedDict, deque
 
-from agent import create_agent, create_streaming_agent, simple_streaming_chat, agent_streaming_chat
+from logging_config import setup_logging
+from agent import create_agent, create_streaming_agent, simple_streaming_chat, agent_streaming_chat, HISTORY_WINDOW, HISTORY_SLACK, warm_up as agent_warm_up, close_clients as close_agent_clients
 from database import init_db, get_db_session, Chat, NetworkNode, NetworkEdge
 from graph_service import graph_service
-from websocket_manager import connection_manager, periodic_ping
+from websocket_manager import connection_manager, encode_message, now_iso, start_clock
+from http_clients import HTTP2, get_http_client
+from background import spawn
+from memory import MAX_CACHED_SESSIONS
 from sqlalchemy import select
+from sqlalchemy.orm import aliased
+import os
 import time
-import requests
-import urllib3
-from requests.auth import HTTPBasicAuth
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 import ssl
 
 # OpenSearch configuration for demo-infra
@@ -33,35 +45,108 @@ OPENSEARCH_INDEXES = [
     "system-metrics-*"
 ]
 
-# Disable SSL warnings for self-signed certificates
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Demo-infra device name -> its log index
+DEVICE_TO_INDEX = {
+    "frr-router": "frr-router-logs",
+    "switch1": "switch1-logs",
+    "switch2": "switch2-logs",
+    "server": "server-logs",
+    "client": "client-logs"
+}
+
+# Demo-infra containers mapped to network device types and their addresses
+CONTAINER_DEVICE_TYPES = {
+    "frr-router": "router",
+    "switch1": "switch",
+    "switch2": "switch",
+    "server": "server",
+    "client": "client"
+}
+CONTAINER_IP_ADDRESSES = {
+    "client": "192.168.10.10",
+    "frr-router": "192.168.10.254",  # Primary interface
+    "server": "192.168.30.10"
+}
+
+# (source, target) link in the demo-infra topology -> subnet and bandwidth
+SUBNET_MAP = {
+    ("client", "switch1"): "192.168.10.0/24 (1Gbps)",
+    ("switch1", "frr-router"): "192.168.10.0/24 (1Gbps)",
+    ("frr-router", "switch2"): "192.168.30.0/24 (1Gbps)",
+    ("switch2", "server"): "192.168.30.0/24 (1Gbps)"
+}
+
+# Log lines carry no explicit level, so it is inferred from keywords; one
+# case-insensitive scan per pattern instead of lowercasing every message
+ERROR_LOG_RE = re.compile(r"error|fail|exception", re.IGNORECASE)
+WARN_LOG_RE = re.compile(r"warn", re.IGNORECASE)
+
+def infer_log_level(message: str) -> str:
+    """ERROR, WARN or INFO depending on the keywords in a log line"""
+    if ERROR_LOG_RE.search(message):
+        return "ERROR"
+    if WARN_LOG_RE.search(message):
+        return "WARN"
+    return "INFO"
+
+setup_logging()
+
+logger = logging.getLogger(__name__)
 
 # Global variables for data hydration
 network_metrics_cache = {}
 last_metrics_update = None
 
-def get_opensearch_session():
-    """Create requests session with OpenSearch authentication"""
-    session = requests.Session()
-    session.auth = HTTPBasicAuth(OPENSEARCH_USERNAME, OPENSEARCH_PASSWORD)
-    session.verify = False  # Disable SSL verification for self-signed certs
-    return session
+# One pooled async client for every OpenSearch query, so calls don't block the
+# event loop and reuse kept-alive TLS connections; created on first use and
+# closed on shutdown
+_opensearch_client: Optional[httpx.AsyncClient] = None
+
+def get_opensearch_client() -> httpx.AsyncClient:
+    """Return the shared OpenSearch client, creating it if needed"""
+    global _opensearch_client
+    if _opensearch_client is None or _opensearch_client.is_closed:
+        _opensearch_client = httpx.AsyncClient(
+            auth=httpx.BasicAuth(OPENSEARCH_USERNAME, OPENSEARCH_PASSWORD),
+            verify=False,  # Self-signed certs in demo-infra
+            # Bodies are encoded with orjson and sent as content=
+            headers={"Content-Type": "application/json"},
+            http2=HTTP2,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            timeout=10.0,
+        )
+    return _opensearch_client
 
 async def query_opensearch_logs(index_pattern: str, query: dict, size: int = 50):
     """Query OpenSearch logs with given parameters"""
     try:
-        session = get_opensearch_session()
+        client = get_opensearch_client()
         url = f"{OPENSEARCH_BASE_URL}/{index_pattern}/_search"
         
-        response = session.post(url, json=query, headers={"Content-Type": "application/json"})
+        response = await client.post(url, content=orjson.dumps(query))
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         return data.get("hits", {}).get("hits", [])
     except Exception as e:
-        print(f"Error querying OpenSearch: {e}")
+        logger.error("Error querying OpenSearch: %s", e)
         return []
 
+async def opensearch_msearch(searches: List[tuple]) -> List[Dict[str, Any]]:
+    """Run several (index, query) searches in one _msearch round trip; returns
+    one response per search, each with "error" set if that search failed"""
+    body = b"".join(
+        orjson.dumps({"index": index}) + b"\n" + orjson.dumps(query) + b"\n"
+        for index, query in searches
+    )
+    response = await get_opensearch_client().post(
+        f"{OPENSEARCH_BASE_URL}/_msearch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)["responses"]
+
 async def fetch_recent_logs_from_opensearch(minutes: int = 30, size: int = 100):
     """Fetch recent logs from all network device indexes - balanced sampling"""
     # Use aggregation to get balanced samples from each device
@@ -72,7 +157,7 @@ async def fetch_recent_logs_from_opensearch(minutes: int = 30, size: int = 100):
         "query": {
             "range": {
                 "@timestamp": {
-                    "gte": f"now-{minutes}m"
+                    "gte": f"now-{minutes}m/m"
                 }
             }
         },
@@ -95,54 +180,53 @@ async def fetch_recent_logs_from_opensearch(minutes: int = 30, size: int = 100):
         }
     }
     
-    session = get_opensearch_session()
-    url = f"{OPENSEARCH_BASE_URL}/*-logs/_search"
+    client = get_opensearch_client()
+    # size:0 aggregations can be answered from OpenSearch's shard request
+    # cache; ranges are rounded to the minute so repeated requests match
+    url = f"{OPENSEARCH_BASE_URL}/*-logs/_search?request_cache=true"
     
     try:
-        response = session.post(url, json=query, headers={"Content-Type": "application/json"})
+        response = await client.post(url, content=orjson.dumps(query))
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
+        
+        # Each device's top hits are already newest first, so merging them
+        # lazily yields the newest `size` logs without sorting every hit
+        buckets = data.get("aggregations", {}).get("by_device", {}).get("buckets", [])
+        newest_hits = heapq.merge(
+            *(zip(repeat(bucket["key"]), bucket["recent_logs"]["hits"]["hits"]) for bucket in buckets),
+            key=lambda entry: entry[1].get("_source", {}).get("@timestamp", ""),
+            reverse=True
+        )
         
         # Transform aggregated results to our format
         transformed_logs = []
+        for device_index, hit in islice(newest_hits, size):
+            device_name = device_index.replace("-logs", "")
+            source = hit.get("_source", {})
+            log_message = source.get("log", "")
+            
+            # Infer log level from content
+            level = infer_log_level(log_message)
+            
+            transformed_logs.append({
+                "id": hit.get("_id", ""),
+                "timestamp": source.get("@timestamp", ""),
+                "level": level,
+                "service": device_name,
+                "message": log_message,
+                "node_id": device_name,
+                "event_type": "log_entry",
+                "metadata": {
+                    "filename": source.get("filename", ""),
+                    "index": device_index
+                }
+            })
         
-        if "aggregations" in data and "by_device" in data["aggregations"]:
-            for bucket in data["aggregations"]["by_device"]["buckets"]:
-                device_index = bucket["key"]
-                device_name = device_index.replace("-logs", "")
-                
-                for hit in bucket["recent_logs"]["hits"]["hits"]:
-                    source = hit.get("_source", {})
-                    log_message = source.get("log", "")
-                    
-                    # Infer log level from content
-                    level = "INFO"
-                    if any(keyword in log_message.lower() for keyword in ["error", "fail", "exception"]):
-                        level = "ERROR"
-                    elif any(keyword in log_message.lower() for keyword in ["warn", "warning"]):
-                        level = "WARN"
-                    
-                    transformed_logs.append({
-                        "id": hit.get("_id", ""),
-                        "timestamp": source.get("@timestamp", ""),
-                        "level": level,
-                        "service": device_name,
-                        "message": log_message,
-                        "node_id": device_name,
-                        "event_type": "log_entry",
-                        "metadata": {
-                            "filename": source.get("filename", ""),
-                            "index": device_index
-                        }
-                    })
-        
-        # Sort all logs by timestamp (most recent first)
-        transformed_logs.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        return transformed_logs[:size]
+        return transformed_logs
         
     except Exception as e:
-        print(f"Error fetching balanced logs: {e}")
+        logger.error("Error fetching balanced logs: %s", e)
         return []
 
 async def sync_network_topology_from_metrics():
@@ -152,11 +236,11 @@ async def sync_network_topology_from_metrics():
         metrics = await fetch_metrics_from_opensearch()
         
         if not metrics:
-            print("No metrics available for topology sync")
+            logger.info("No metrics available for topology sync")
             return
             
         async with get_db_session() as session:
-            from sqlalchemy import select, delete
+            from sqlalchemy import select, delete, update
             from database import NetworkNode, NetworkEdge
             from datetime import datetime, timedelta
             
@@ -166,27 +250,36 @@ async def sync_network_topology_from_metrics():
             
             current_time = datetime.now()
             updated_nodes = set()
+            # Existing nodes are updated with one executemany UPDATE keyed by
+            # primary key and new ones inserted together, instead of a
+            # statement per node at flush time
+            node_updates = []
+            new_nodes = []
             
             # Process each host from metrics
             for host_name, host_data in metrics.items():
                 # Create or update host node
                 host_node_name = f"host-{host_name}"
+                host_metadata = {
+                    "cpu_usage": host_data.get("cpu_usage"),
+                    "memory_usage": host_data.get("memory_usage"),
+                    "memory_total": host_data.get("memory_total"),
+                    "memory_used": host_data.get("memory_used"),
+                    "disk_usage": host_data.get("disk_usage"),
+                    "load_average": host_data.get("load_average"),
+                    "uptime": host_data.get("uptime"),
+                    "metric_source": "metricbeat"
+                }
                 if host_node_name in existing_nodes:
                     host_node = existing_nodes[host_node_name]
-                    host_node.last_updated = current_time
-                    host_node.status = "online"
-                    host_node.node_metadata.update({
-                        "cpu_usage": host_data.get("cpu_usage"),
-                        "memory_usage": host_data.get("memory_usage"),
-                        "memory_total": host_data.get("memory_total"),
-                        "memory_used": host_data.get("memory_used"),
-                        "disk_usage": host_data.get("disk_usage"),
-                        "load_average": host_data.get("load_average"),
-                        "uptime": host_data.get("uptime"),
-                        "metric_source": "metricbeat"
+                    node_updates.append({
+                        "id": host_node.id,
+                        "last_updated": current_time,
+                        "status": "online",
+                        "node_metadata": {**host_node.node_metadata, **host_metadata}
                     })
                 else:
-                    host_node = NetworkNode(
+                    new_nodes.append(NetworkNode(
                         name=host_node_name,
                         type="host",
                         ip_address=None,
@@ -194,19 +287,9 @@ async def sync_network_topology_from_metrics():
                         layer="infrastructure",
                         position_x=0.0,
                         position_y=0.0,
-                        node_metadata={
-                            "cpu_usage": host_data.get("cpu_usage"),
-                            "memory_usage": host_data.get("memory_usage"),
-                            "memory_total": host_data.get("memory_total"),
-                            "memory_used": host_data.get("memory_used"),
-                            "disk_usage": host_data.get("disk_usage"),
-                            "load_average": host_data.get("load_average"),
-                            "uptime": host_data.get("uptime"),
-                            "metric_source": "metricbeat"
-                        },
+                        node_metadata=host_metadata,
                         last_updated=current_time
-                    )
-                    session.add(host_node)
+                    ))
                     
                 updated_nodes.add(host_node_name)
                 
@@ -217,80 +300,64 @@ async def sync_network_topology_from_metrics():
                     if not container_name:
                         continue
                         
-                    # Map container names to network device types
-                    device_type = "container"
-                    if container_name in ["frr-router"]:
-                        device_type = "router"
-                    elif container_name in ["switch1", "switch2"]:
-                        device_type = "switch"
-                    elif container_name in ["server"]:
-                        device_type = "server"
-                    elif container_name in ["client"]:
-                        device_type = "client"
-                    
-                    # Determine IP based on container name and demo-infra topology
-                    ip_address = None
-                    if container_name == "client":
-                        ip_address = "192.168.10.10"
-                    elif container_name == "frr-router":
-                        ip_address = "192.168.10.254"  # Primary interface
-                    elif container_name == "server":
-                        ip_address = "192.168.30.10"
+                    device_type = CONTAINER_DEVICE_TYPES.get(container_name, "container")
+                    ip_address = CONTAINER_IP_ADDRESSES.get(container_name)
                     
+                    container_status = "online" if "Up" in container.get("status", "") else "offline"
+                    container_metadata = {
+                        "container_id": container.get("id"),
+                        "container_status": container.get("status"),
+                        "cpu_usage": container.get("cpu_usage"),
+                        "memory_usage": container.get("memory_usage"),
+                        "host": host_name,
+                        "metric_source": "metricbeat"
+                    }
                     if container_name in existing_nodes:
                         container_node = existing_nodes[container_name]
-                        container_node.last_updated = current_time
-                        container_node.status = "online" if "Up" in container.get("status", "") else "offline"
-                        container_node.type = device_type
-                        container_node.ip_address = ip_address
-                        container_node.node_metadata.update({
-                            "container_id": container.get("id"),
-                            "container_status": container.get("status"),
-                            "cpu_usage": container.get("cpu_usage"),
-                            "memory_usage": container.get("memory_usage"),
-                            "host": host_name,
-                            "metric_source": "metricbeat"
+                        node_updates.append({
+                            "id": container_node.id,
+                            "last_updated": current_time,
+                            "status": container_status,
+                            "type": device_type,
+                            "ip_address": ip_address,
+                            "node_metadata": {**container_node.node_metadata, **container_metadata}
                         })
                     else:
-                        container_node = NetworkNode(
+                        new_nodes.append(NetworkNode(
                             name=container_name,
                             type=device_type,
                             ip_address=ip_address,
-                            status="online" if "Up" in container.get("status", "") else "offline",
+                            status=container_status,
                             layer="network",
                             position_x=0.0,
                             position_y=0.0,
-                            node_metadata={
-                                "container_id": container.get("id"),
-                                "container_status": container.get("status"),
-                                "cpu_usage": container.get("cpu_usage"),
-                                "memory_usage": container.get("memory_usage"),
-                                "host": host_name,
-                                "metric_source": "metricbeat"
-                            },
+                            node_metadata=container_metadata,
                             last_updated=current_time
-                        )
-                        session.add(container_node)
+                        ))
                         
                     updated_nodes.add(container_name)
             
+            if node_updates:
+                await session.execute(update(NetworkNode), node_updates)
+            session.add_all(new_nodes)
+            
             # Clean up stale nodes (only ones without MetricBeat data and older than 30 minutes)
             stale_threshold = current_time - timedelta(minutes=30)
             for node_name, node in existing_nodes.items():
                 if (node_name not in updated_nodes and 
                     node.last_updated < stale_threshold and
                     node.node_metadata.get("metric_source") != "metricbeat"):
-                    print(f"Removing stale node: {node_name}")
+                    logger.info("Removing stale node: %s", node_name)
                     await session.delete(node)
             
             # Create network topology edges based on demo-infra structure
             await create_demo_network_edges(session)
             
             await session.commit()
-            print(f"Synced network topology: {len(updated_nodes)} nodes updated")
+            logger.info("Synced network topology: %d nodes updated", len(updated_nodes))
             
     except Exception as e:
-        print(f"Error syncing network topology: {e}")
+        logger.error("Error syncing network topology: %s", e)
 
 async def create_demo_network_edges(session):
     """Create edges representing the demo-infra network topology"""
@@ -327,15 +394,7 @@ async def create_demo_network_edges(session):
             
             if edge_key not in existing_edges and reverse_edge_key not in existing_edges:
                 # Determine subnet based on connection
-                subnet_info = "1Gbps"
-                if source_name == "client" and target_name == "switch1":
-                    subnet_info = "192.168.10.0/24 (1Gbps)"
-                elif source_name == "switch1" and target_name == "frr-router":
-                    subnet_info = "192.168.10.0/24 (1Gbps)"
-                elif source_name == "frr-router" and target_name == "switch2":
-                    subnet_info = "192.168.30.0/24 (1Gbps)"
-                elif source_name == "switch2" and target_name == "server":
-                    subnet_info = "192.168.30.0/24 (1Gbps)"
+                subnet_info = SUBNET_MAP.get((source_name, target_name), "1Gbps")
                 
                 # Create new edge
                 new_edge = NetworkEdge(
@@ -360,20 +419,42 @@ async def create_demo_network_edges(session):
                 edge.status = "active"
                 # Update subnet info if not already set
                 if "subnet" not in edge.edge_metadata:
-                    subnet_info = "1Gbps"
-                    if source_name == "client" and target_name == "switch1":
-                        subnet_info = "192.168.10.0/24 (1Gbps)"
-                    elif source_name == "switch1" and target_name == "frr-router":
-                        subnet_info = "192.168.10.0/24 (1Gbps)"
-                    elif source_name == "frr-router" and target_name == "switch2":
-                        subnet_info = "192.168.30.0/24 (1Gbps)"
-                    elif source_name == "switch2" and target_name == "server":
-                        subnet_info = "192.168.30.0/24 (1Gbps)"
-                    
+                    subnet_info = SUBNET_MAP.get((source_name, target_name), "1Gbps")
                     edge.bandwidth = subnet_info
-                    edge.edge_metadata["subnet"] = subnet_info.split(" (")[0] if "(" in subnet_info else "N/A"
+                    # Reassigned so the JSON column is marked as changed
+                    edge.edge_metadata = {
+                        **edge.edge_metadata,
+                        "subnet": subnet_info.split(" (")[0] if "(" in subnet_info else "N/A"
+                    }
+
+# MetricBeat reports every ~10s, so metrics younger than that are served from
+# the cache; up to METRICS_STALE_SECONDS they are still served, with a
+# refresh started in the background, and only older metrics make callers wait
+METRICS_FRESH_SECONDS = 10
+METRICS_STALE_SECONDS = 30
+_metrics_lock = asyncio.Lock()
 
 async def fetch_metrics_from_opensearch():
+    """Get system metrics per host, from the cache when it is recent enough"""
+    if network_metrics_cache and last_metrics_update:
+        age = (datetime.now() - last_metrics_update).total_seconds()
+        if age < METRICS_FRESH_SECONDS:
+            return network_metrics_cache
+        if age < METRICS_STALE_SECONDS:
+            if not _metrics_lock.locked():
+                spawn(refresh_metrics())
+            return network_metrics_cache
+    return await refresh_metrics()
+
+async def refresh_metrics():
+    """Query OpenSearch for metrics; concurrent callers share one query"""
+    if _metrics_lock.locked():
+        async with _metrics_lock:
+            return network_metrics_cache
+    async with _metrics_lock:
+        return await _query_metrics()
+
+async def _query_metrics():
     """Fetch system metrics from OpenSearch to hydrate network data"""
     global network_metrics_cache, last_metrics_update
     
@@ -384,7 +465,7 @@ async def fetch_metrics_from_opensearch():
                     {
                         "range": {
                             "@timestamp": {
-                                "gte": "now-5m"
+                                "gte": "now-5m/m"
                             }
                         }
                     }
@@ -398,7 +479,7 @@ async def fetch_metrics_from_opensearch():
                 }
             }
         ],
-        "size": 100,
+        "size": 0,  # Only the aggregations are used
         "aggs": {
             "by_host": {
                 "terms": {
@@ -446,13 +527,13 @@ async def fetch_metrics_from_opensearch():
     }
     
     try:
-        session = get_opensearch_session()
-        url = f"{OPENSEARCH_BASE_URL}/system-metrics-*/_search"
+        client = get_opensearch_client()
+        url = f"{OPENSEARCH_BASE_URL}/system-metrics-*/_search?request_cache=true"
         
-        response = session.post(url, json=query, headers={"Content-Type": "application/json"})
+        response = await client.post(url, content=orjson.dumps(query))
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         
         # Process aggregations to build host metrics
         metrics = {}
@@ -500,14 +581,20 @@ async def fetch_metrics_from_opensearch():
         
         network_metrics_cache = metrics
         last_metrics_update = datetime.now()
-        print(f"Updated metrics cache with {len(metrics)} hosts")
+        logger.info("Updated metrics cache with %d hosts", len(metrics))
         
         return metrics
     except Exception as e:
-        print(f"Error fetching metrics: {e}")
+        logger.error("Error fetching metrics: %s", e)
         return {}
 
-app = FastAPI(title="NetViz Backend", version="1.0.0")
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; FastAPI's own ORJSONResponse is deprecated"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+app = FastAPI(title="NetViz Backend", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Enable CORS
 app.add_middleware(
@@ -516,8 +603,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-ID"],
 )
 
+# Compress JSON and SSE responses for clients that accept gzip. Streamed
+# chunks are sync-flushed, so each SSE frame still goes out as soon as it
+# is written; Starlette skips event streams unless the exclusions are cleared
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5, exclude_content_types=())
+
 # AI Agent tool functions
 @app.post("/ai/query-logs")
 async def ai_query_logs(
@@ -530,9 +623,10 @@ async def ai_query_logs(
 ):
     """AI Agent tool for querying logs from OpenSearch with flexible parameters"""
     try:
-        print(f"=== AI QUERY LOGS DEBUG ===")
-        print(f"device_name='{device_name}', service='{service}', log_level='{log_level}'")
-        print(f"time_range={time_range}, size={size}")
+        logger.debug(
+            "ai_query_logs: device_name=%r, service=%r, log_level=%r, time_range=%s, size=%s",
+            device_name, service, log_level, time_range, size
+        )
         opensearch_query = {
             "size": size,
             "sort": [{"@timestamp": {"order": "desc"}}],
@@ -551,28 +645,19 @@ async def ai_query_logs(
             }
         }
         
-        # Device name to index mapping
-        device_to_index = {
-            "frr-router": "frr-router-logs",
-            "switch1": "switch1-logs", 
-            "switch2": "switch2-logs",
-            "server": "server-logs",
-            "client": "client-logs"
-        }
-        
         # Default to searching all log indexes if no specific device
         target_indexes = "*-logs"
         
         # Add filters based on parameters
         if device_name:
             # Map device name to specific index
-            if device_name in device_to_index:
-                target_indexes = device_to_index[device_name]
-                print(f"Mapping device '{device_name}' to index '{target_indexes}'")
+            if device_name in DEVICE_TO_INDEX:
+                target_indexes = DEVICE_TO_INDEX[device_name]
+                logger.debug("Mapping device %r to index %r", device_name, target_indexes)
             else:
                 # Fallback to wildcard search
                 target_indexes = f"*{device_name}*-logs"
-                print(f"Using fallback mapping for device '{device_name}': {target_indexes}")
+                logger.debug("Using fallback mapping for device %r: %s", device_name, target_indexes)
         
         if service:
             opensearch_query["query"]["bool"]["must"].append({
@@ -589,35 +674,31 @@ async def ai_query_logs(
                 "query_string": {"query": query}
             })
         
-        session = get_opensearch_session()
+        client = get_opensearch_client()
         url = f"{OPENSEARCH_BASE_URL}/{target_indexes}/_search"
-        print(f"Querying OpenSearch URL: {url}")
+        logger.debug("Querying OpenSearch URL: %s", url)
         
-        response = session.post(url, json=opensearch_query, headers={"Content-Type": "application/json"})
+        response = await client.post(url, content=orjson.dumps(opensearch_query))
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         logs = []
         
-        print(f"OpenSearch query: {opensearch_query}")
-        print(f"OpenSearch returned {data.get('hits', {}).get('total', {}).get('value', 0)} total hits")
+        logger.debug("OpenSearch query: %s", opensearch_query)
+        logger.debug("OpenSearch returned %s total hits", data.get('hits', {}).get('total', {}).get('value', 0))
         
         # Debug: show which indexes are being hit
         indexes_hit = set()
         for hit in data.get("hits", {}).get("hits", []):
             indexes_hit.add(hit.get("_index", "unknown"))
-        print(f"Indexes in results: {list(indexes_hit)}")
+        logger.debug("Indexes in results: %s", list(indexes_hit))
         
         for hit in data.get("hits", {}).get("hits", []):
             source = hit["_source"]
             log_message = source.get("log", source.get("message", ""))
             
             # Infer log level from content (same as working function)
-            level = "INFO"
-            if any(keyword in log_message.lower() for keyword in ["error", "fail", "exception"]):
-                level = "ERROR"
-            elif any(keyword in log_message.lower() for keyword in ["warn", "warning"]):
-                level = "WARN"
+            level = infer_log_level(log_message)
             
             logs.append({
                 "id": hit["_id"],
@@ -666,7 +747,7 @@ async def ai_query_metrics(
                         {
                             "range": {
                                 "@timestamp": {
-                                    "gte": f"now-{time_range}h"
+                                    "gte": f"now-{time_range}h/m"
                                 }
                             }
                         }
@@ -707,13 +788,13 @@ async def ai_query_metrics(
                 "term": {"container.name.keyword": container_name}
             })
         
-        session = get_opensearch_session()
-        url = f"{OPENSEARCH_BASE_URL}/system-metrics-*/_search"
+        client = get_opensearch_client()
+        url = f"{OPENSEARCH_BASE_URL}/system-metrics-*/_search?request_cache=true"
         
-        response = session.post(url, json=opensearch_query, headers={"Content-Type": "application/json"})
+        response = await client.post(url, content=orjson.dumps(opensearch_query))
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         metrics = {}
         
         if "aggregations" in data and "by_host" in data["aggregations"]:
@@ -759,11 +840,11 @@ async def ai_get_device_info(device_id: str):
             if not device:
                 raise HTTPException(status_code=404, detail="Device not found")
             
-            # Get recent metrics for this device
-            metrics_response = await ai_query_metrics(device_name=device.name, time_range=1)
-            
-            # Get recent logs for this device
-            logs_response = await ai_query_logs(device_name=device.name, time_range=2, size=20)
+            # Get recent metrics and logs for this device concurrently
+            metrics_response, logs_response = await asyncio.gather(
+                ai_query_metrics(device_name=device.name, time_range=1),
+                ai_query_logs(device_name=device.name, time_range=2, size=20)
+            )
             
             return {
                 "device": {
@@ -821,37 +902,99 @@ async def clear_bad_data():
                 )
                 
                 await session.commit()
-                print(f"Cleared {len(nodes_to_delete)} bad/test nodes and their edges")
+                logger.info("Cleared %d bad/test nodes and their edges", len(nodes_to_delete))
             else:
-                print("No bad data found to clear")
+                logger.debug("No bad data found to clear")
                 
     except Exception as e:
-        print(f"Error clearing bad data: {e}")
+        logger.error("Error clearing bad data: %s", e)
+
+# Background jobs for connection keep-alive, metrics hydration and topology sync
+PING_INTERVAL = 30
+METRICS_SYNC_INTERVAL = 30
+METRICS_RETRY_INTERVAL = 60  # Wait longer after a failed sync
+
+async def ping_once() -> float:
+    """Ping all websocket connections; returns seconds until the next run"""
+    await connection_manager.ping_connections()
+    return PING_INTERVAL
+
+async def sync_metrics_once() -> float:
+    """Fetch metrics and sync topology; returns seconds until the next run"""
+    try:
+        await refresh_metrics()
+        await sync_network_topology_from_metrics()
+        return METRICS_SYNC_INTERVAL
+    except Exception as e:
+        logger.warning("Error in periodic metrics fetch: %s", e)
+        return METRICS_RETRY_INTERVAL
 
-# Background task for metrics hydration and topology sync
-async def periodic_metrics_fetch():
-    """Periodically fetch metrics from OpenSearch and sync topology"""
+async def run_periodic_jobs():
+    """Run every periodic job from a single task that sleeps until the
+    earliest deadline, instead of one timer loop per job"""
     # First run: clear bad data
     await clear_bad_data()
     
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    # (deadline, tiebreak, job); metrics sync right away, first ping after one interval
+    jobs = [(now, 0, sync_metrics_once), (now + PING_INTERVAL, 1, ping_once)]
+    heapq.heapify(jobs)
+    
     while True:
+        deadline, index, job = jobs[0]
+        delay = deadline - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
         try:
-            # Fetch metrics and sync topology
-            await fetch_metrics_from_opensearch()
-            await sync_network_topology_from_metrics()
-            await asyncio.sleep(30)  # Update every 30 seconds
-        except Exception as e:
-            print(f"Error in periodic metrics fetch: {e}")
-            await asyncio.sleep(60)  # Wait longer on error
+            interval = await job()
+        except Exception:
+            logger.exception("Periodic job %s failed", job.__name__)
+            interval = PING_INTERVAL
+        heapq.heapreplace(jobs, (loop.time() + interval, index, job))
+
+# Threads behind asyncio.to_thread / run_in_executor(None, ...): every
+# streamed Llama response holds one for its whole duration, alongside SSH
+# commands and memory extraction, so the CPU-based default is far too small
+DEFAULT_EXECUTOR_THREADS = int(os.getenv("DEFAULT_EXECUTOR_THREADS", "64"))
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=DEFAULT_EXECUTOR_THREADS, thread_name_prefix="blocking")
+    )
     await init_db()
-    # Start periodic ping task
-    asyncio.create_task(periodic_ping())
-    # Start periodic metrics fetch
-    asyncio.create_task(periodic_metrics_fetch())
+    # Compile the LangGraph agent once instead of on the first /chat request;
+    # the compiled graph is safe to share between concurrent requests
+    app.state.agent = create_agent()
+    # Start the websocket ping and metrics sync jobs
+    spawn(run_periodic_jobs())
+    app.state.chat_writer = spawn(chat_writer())
+    start_clock()
+    # Shared client for outbound HTTP from tools and endpoints
+    app.state.http = get_http_client()
+    # Connect to the LLM APIs in the background so the first chat request
+    # doesn't pay for the handshakes
+    spawn(warm_llm_clients())
+
+async def warm_llm_clients():
+    import enhanced_agent
+    await asyncio.gather(agent_warm_up(), enhanced_agent.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    import enhanced_agent
+    # The sentinel lets the writer finish the batch it is holding
+    await chat_write_queue.put(None)
+    await app.state.chat_writer
+    await flush_chat_writes()
+    await enhanced_agent.close_clients()
+    await app.state.http.aclose()
+    if _opensearch_client is not None:
+        await _opensearch_client.aclose()
+    close_agent_clients()
 
 # Models
 class ChatRequest(BaseModel):
@@ -863,6 +1006,7 @@ class StreamingChatRequest(BaseModel):
     session_id: Optional[str] = "default"
     context: Optional[Dict[str, Any]] = None  # Network context (focused node, etc)
     conversation_history: Optional[List[Dict[str, str]]] = None  # Previous messages for context
+    intent_routing: bool = True  # Answer simple one-tool requests without the LLM
     
 class NetworkNodeData(BaseModel):
     name: str
@@ -888,6 +1032,36 @@ class GraphUpdateRequest(BaseModel):
     edges: Optional[List[Dict[str, Any]]] = None
     source: str = "external_device"
 
+class BulkNodeItem(BaseModel):
+    """A node in a bulk update; entries with an id are partial updates"""
+    model_config = ConfigDict(extra="allow")
+    
+    id: Optional[Union[int, str]] = None
+    name: Optional[str] = None
+    type: Optional[str] = None
+    ip_address: Optional[str] = None
+    status: Optional[str] = None
+    layer: Optional[str] = None
+    position: Optional[Dict[str, float]] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+class BulkEdgeItem(BaseModel):
+    """An edge in a bulk update; entries with an id are partial updates"""
+    model_config = ConfigDict(extra="allow")
+    
+    id: Optional[Union[int, str]] = None
+    source: Optional[Union[int, str]] = None
+    target: Optional[Union[int, str]] = None
+    type: Optional[str] = None
+    bandwidth: Optional[str] = None
+    utilization: Optional[float] = None
+    status: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+# Built once so each bulk update validates its whole list in a single call
+NODE_LIST_ADAPTER = TypeAdapter(List[BulkNodeItem])
+EDGE_LIST_ADAPTER = TypeAdapter(List[BulkEdgeItem])
+
 class LogQuery(BaseModel):
     level: Optional[List[str]] = None
     event_type: Optional[str] = None
@@ -912,6 +1086,25 @@ class LogEntry(BaseModel):
 async def health_check():
     return {"status": "healthy"}
 
+# binary -> (graph version, encoded graph_state message), so a burst of
+# reconnects encodes the snapshot once per format rather than once per client
+_snapshot_cache: Dict[bool, tuple] = {}
+
+async def _cached_snapshot(binary: bool):
+    """Encoded graph_state message for the current graph version"""
+    version = graph_service.version
+    cached = _snapshot_cache.get(binary)
+    if cached is None or cached[0] != version:
+        graph = await graph_service.get_graph()
+        state_message = {
+            "type": "graph_state",
+            "nodes": list(graph["nodes"].values()),
+            "edges": list(graph["edges"].values()),
+            "timestamp": datetime.now(UTC).isoformat()
+        }
+        cached = _snapshot_cache[binary] = (version, encode_message(state_message, binary))
+    return cached[1]
+
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str = "default"):
@@ -920,21 +1113,19 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str = "default"):
     
     try:
         # Send initial graph state
-        nodes = await graph_service.get_nodes()
-        edges = await graph_service.get_edges()
-        await connection_manager.send_graph_state(session_id, nodes, edges)
+        snapshot = await _cached_snapshot(connection_manager.is_binary(websocket))
+        await connection_manager.send_encoded(websocket, snapshot)
         
         # Keep connection alive and handle incoming messages
         while True:
             try:
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                message = await connection_manager.receive(websocket)
                 
                 # Handle different message types
                 if message.get("type") == "ping":
                     await connection_manager.send_to_connection(websocket, {
                         "type": "pong",
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": now_iso()
                     })
                 elif message.get("type") == "request_graph_state":
                     nodes = await graph_service.get_nodes()
@@ -944,7 +1135,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str = "default"):
             except WebSocketDisconnect:
                 break
             except Exception as e:
-                print(f"WebSocket error: {e}")
+                logger.warning("WebSocket error: %s", e)
                 break
                 
     except WebSocketDisconnect:
@@ -952,92 +1143,266 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str = "default"):
     finally:
         connection_manager.disconnect(websocket)
 
+# session_id -> recent history messages, written through whenever a chat is
+# saved, so /chat/stream only reads the database on a session's first request
+HISTORY_CACHE_MESSAGES = 2 * (HISTORY_WINDOW + HISTORY_SLACK)
+HISTORY_CACHE: "OrderedDict[str, deque]" = OrderedDict()
+_history_locks: Dict[str, asyncio.Lock] = {}
+
+async def load_history(session_id: str) -> deque:
+    """Recent messages for a session, from the cache or, once, from the database"""
+    history = HISTORY_CACHE.get(session_id)
+    if history is not None:
+        HISTORY_CACHE.move_to_end(session_id)
+        return history
+    
+    # One database read per session even if several requests arrive at once
+    lock = _history_locks.setdefault(session_id, asyncio.Lock())
+    async with lock:
+        history = HISTORY_CACHE.get(session_id)
+        if history is None:
+            # Newest rows first to apply the limit, then re-sorted in SQL so
+            # they come back in chronological order
+            recent = (
+                select(Chat)
+                .where(Chat.session_id == session_id)
+                .order_by(Chat.timestamp.desc())
+                .limit(HISTORY_WINDOW + HISTORY_SLACK)
+                .subquery()
+            )
+            recent_chat = aliased(Chat, recent)
+            async with get_db_session() as session:
+                result = await session.execute(select(recent_chat).order_by(recent_chat.timestamp))
+                chats = result.scalars().all()
+            
+            # Convert to conversation format
+            history = deque(
+                (
+                    entry
+                    for chat in chats
+                    for entry in ({"role": "user", "content": chat.message}, {"role": "assistant", "content": chat.response})
+                ),
+                maxlen=HISTORY_CACHE_MESSAGES
+            )
+            
+            HISTORY_CACHE[session_id] = history
+            if len(HISTORY_CACHE) > MAX_CACHED_SESSIONS:
+                HISTORY_CACHE.popitem(last=False)
+        _history_locks.pop(session_id, None)
+    return history
+
+def cache_exchange(session_id: str, message: str, response: str):
+    """Write a saved exchange through to the session's cached history"""
+    history = HISTORY_CACHE.get(session_id)
+    if history is not None:
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": response})
+
+# Chat rows are written by a single background task so responses don't wait
+# on a commit; queued rows are flushed in batches with one commit each, and
+# new rows are dropped once the queue is full
+CHAT_WRITE_BATCH = 64
+CHAT_WRITE_INTERVAL = 0.1
+CHAT_WRITE_QUEUE_SIZE = 10000
+chat_write_queue: asyncio.Queue = asyncio.Queue(maxsize=CHAT_WRITE_QUEUE_SIZE)
+
+def save_chat(session_id: str, message: str, response: str):
+    """Queue an exchange for the database and add it to the cached history"""
+    chat_record = Chat(
+        session_id=session_id,
+        message=message,
+        response=response,
+        timestamp=datetime.now()
+    )
+    try:
+        chat_write_queue.put_nowait(chat_record)
+    except asyncio.QueueFull:
+        logger.warning("Chat write queue full, dropping record for session %s", session_id)
+    cache_exchange(session_id, message, response)
+
+async def write_chats(batch: List[Chat]):
+    try:
+        async with get_db_session() as session:
+            session.add_all(batch)
+            await session.commit()
+    except Exception:
+        logger.exception("Failed to save %d chat records", len(batch))
+
+async def chat_writer():
+    """Drain the chat write queue until it yields the None stop sentinel"""
+    while True:
+        record = await chat_write_queue.get()
+        if record is None:
+            return
+        batch = [record]
+        if chat_write_queue.qsize() < CHAT_WRITE_BATCH - 1:
+            await asyncio.sleep(CHAT_WRITE_INTERVAL)
+        stopping = False
+        while len(batch) < CHAT_WRITE_BATCH and not chat_write_queue.empty():
+            record = chat_write_queue.get_nowait()
+            if record is None:
+                stopping = True
+                break
+            batch.append(record)
+        await write_chats(batch)
+        if stopping:
+            return
+
+async def flush_chat_writes():
+    """Write whatever was queued after the writer stopped, used on shutdown"""
+    batch = []
+    while not chat_write_queue.empty():
+        batch.append(chat_write_queue.get_nowait())
+    if batch:
+        await write_chats(batch)
+
+# The fixed parts of SSE frames are encoded once; per event only the variable
+# values go through orjson
+DONE_FRAME = b"data: " + orjson.dumps({"type": "done"}) + b"\n\n"
+_TEXT_FRAME_PREFIX = b'data: {"type":"text","content":'
+_DONE_FRAME_PREFIX = b'data: {"type":"done"'
+_SEQ_FRAME_SUFFIX = b',"seq":%d}\n\n'
+
+def _encode_text(content: str, seq: int) -> bytes:
+    return _TEXT_FRAME_PREFIX + orjson.dumps(content) + _SEQ_FRAME_SUFFIX % seq
+
+def _encode_done(seq: int) -> bytes:
+    return _DONE_FRAME_PREFIX + _SEQ_FRAME_SUFFIX % seq
+
+def _word_chunks(text: str, size: int = 4) -> List[str]:
+    """Split text into chunks of `size` words, each followed by a space"""
+    words = text.split()
+    return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+# Canned reply streamed when the agent fails; only the first sentence quotes
+# the request, so the rest is chunked once here
+FALLBACK_HELP_CHUNKS = _word_chunks(
+    "As a network infrastructure assistant, I can help you with various tasks like checking device status, "
+    "creating Ansible playbooks, and managing network infrastructure. Try asking me to 'show ssh connection', "
+    "'create ansible playbook', 'generate documentation', or 'write python script' to see rich content examples."
+)
+FALLBACK_HELP_CHUNKS[-1] = FALLBACK_HELP_CHUNKS[-1].rstrip()
+
+# Upper bounds on how long / how many bytes of ready frames are held back so
+# they can go out in one write
+SSE_BATCH_SECONDS = 0.005
+SSE_BATCH_BYTES = 4096
+
+_FRAMES_END = object()
+
+async def coalesce_frames(frames: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+    """Join SSE frames that are ready at about the same time into one chunk
+    
+    A frame is never held back more than SSE_BATCH_SECONDS; each chunk still
+    holds whole `data:` records, which the client dispatches one by one.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def pump():
+        try:
+            async for frame in frames:
+                queue.put_nowait(frame)
+        finally:
+            queue.put_nowait(_FRAMES_END)
+    
+    pump_task = asyncio.create_task(pump())
+    try:
+        finished = False
+        while not finished:
+            batch = [await queue.get()]
+            if batch[0] is _FRAMES_END:
+                break
+            size = len(batch[0])
+            
+            # Drain what is already queued, give the producer one short window
+            # to add more, then drain again
+            for wait in (0, SSE_BATCH_SECONDS):
+                if wait:
+                    if size >= SSE_BATCH_BYTES:
+                        break
+                    await asyncio.sleep(wait)
+                while size < SSE_BATCH_BYTES and not queue.empty():
+                    frame = queue.get_nowait()
+                    if frame is _FRAMES_END:
+                        finished = True
+                        break
+                    batch.append(frame)
+                    size += len(frame)
+                if finished:
+                    break
+            
+            yield b"".join(batch)
+        
+        # Surface an error raised by the producer
+        await pump_task
+    finally:
+        pump_task.cancel()
+
 # Streaming chat endpoint with SSE
 @app.post("/chat/stream")
 async def stream_chat(request: StreamingChatRequest):
     """Stream chat responses with tool execution support"""
     
-    async def generate_events() -> AsyncGenerator[str, None]:
+    # Every event carries its position in the stream so the client can
+    # reorder or resume; the stream itself is identified by X-Stream-ID
+    stream_id = uuid4().hex
+    sequence = count(1)
+    
+    def sse_event(payload: Dict[str, Any]) -> bytes:
+        payload["seq"] = next(sequence)
+        return b"data: " + orjson.dumps(payload, default=str) + b"\n\n"
+    
+    async def generate_events() -> AsyncGenerator[bytes, None]:
         try:
-            # Debug log
-            print(f"Received chat request: {request.message}")
-            print(f"Context: {request.context}")
+            logger.debug("Received chat request %s: %r (context: %r)", stream_id, request.message, request.context)
             
             # Try to use the real AI agent, fall back to simple streaming if it fails
             full_response = ""
             
             try:
-                # Load conversation history from database
-                conversation_history = []
-                async with get_db_session() as session:
-                    result = await session.execute(
-                        select(Chat).where(Chat.session_id == request.session_id).order_by(Chat.timestamp.desc()).limit(20)
-                    )
-                    chats = result.scalars().all()
-                    
-                    # Convert to conversation format (reverse to get chronological order)
-                    for chat in reversed(chats):
-                        conversation_history.append({"role": "user", "content": chat.message})
-                        conversation_history.append({"role": "assistant", "content": chat.response})
+                conversation_history = await load_history(request.session_id)
                 
                 # Try using the agent streaming chat function with tools
-                async for chunk in agent_streaming_chat(request.message, request.context, conversation_history):
+                async for chunk in agent_streaming_chat(request.message, request.context, conversation_history, request.session_id, request.intent_routing):
                     if chunk["type"] == "text" or chunk["type"] == "content":
                         content = chunk.get("content") or chunk.get("text", "")
                         full_response += content
                         # Normalize to 'text' type for frontend compatibility
-                        yield f"data: {json.dumps({'type': 'text', 'content': content})}\n\n"
+                        yield _encode_text(content, next(sequence))
                     elif chunk["type"] == "tool_result":
-                        yield f"data: {json.dumps(chunk)}\n\n"
+                        yield sse_event(chunk)
                     elif chunk["type"] == "done":
                         break
                     else:
-                        yield f"data: {json.dumps(chunk)}\n\n"
+                        yield sse_event(chunk)
                         
             except Exception as agent_error:
-                print(f"Agent failed: {agent_error}, falling back to rich content demos")
+                logger.warning("Agent failed for stream %s, falling back to canned response: %s", stream_id, agent_error)
                 
-                # Simple fallback response
-                response_text = f"I understand you're asking about: '{request.message}'. As a network infrastructure assistant, I can help you with various tasks like checking device status, creating Ansible playbooks, and managing network infrastructure. Try asking me to 'show ssh connection', 'create ansible playbook', 'generate documentation', or 'write python script' to see rich content examples."
-                
-                # Stream the response in chunks
-                words = response_text.split()
-                chunk_size = 4
-                for i in range(0, len(words), chunk_size):
-                    chunk = " ".join(words[i:i+chunk_size])
-                    if i + chunk_size < len(words):
-                        chunk += " "
+                # Simple fallback response, streamed in chunks
+                for chunk in chain(_word_chunks(f"I understand you're asking about: '{request.message}'."), FALLBACK_HELP_CHUNKS):
                     full_response += chunk
-                    yield f"data: {json.dumps({'type': 'text', 'content': chunk})}\n\n"
+                    yield _encode_text(chunk, next(sequence))
                     await asyncio.sleep(0.1)
             
-            # Save to database
-            async with get_db_session() as session:
-                chat_record = Chat(
-                    session_id=request.session_id,
-                    message=request.message,
-                    response=full_response or "[No response]",
-                    timestamp=datetime.now()
-                )
-                session.add(chat_record)
-                await session.commit()
+            # Queue for the database; the commit happens off the stream
+            save_chat(request.session_id, request.message, full_response or "[No response]")
             
             # Send completion
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield _encode_done(next(sequence))
                 
         except Exception as e:
-            print(f"Error in stream_chat: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+            logger.exception("stream_chat failed for stream %s", stream_id)
+            yield sse_event({'type': 'error', 'error': str(e)})
     
     return StreamingResponse(
-        generate_events(),
+        coalesce_frames(generate_events()),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "X-Accel-Buffering": "no",
             "Connection": "keep-alive",
+            "X-Stream-ID": stream_id,
         }
     )
 
@@ -1045,7 +1410,7 @@ async def stream_chat(request: StreamingChatRequest):
 @app.post("/chat")
 async def chat(request: ChatRequest):
     """Handle chat messages with the AI agent"""
-    agent = create_agent()
+    agent = app.state.agent
     
     try:
         # Invoke agent
@@ -1057,15 +1422,7 @@ async def chat(request: ChatRequest):
         response_content = result["messages"][-1].content
         
         # Store in database
-        async with get_db_session() as session:
-            chat_record = Chat(
-                session_id=request.session_id,
-                message=request.message,
-                response=response_content,
-                timestamp=datetime.now()
-            )
-            session.add(chat_record)
-            await session.commit()
+        save_chat(request.session_id, request.message, response_content)
         
         return {
             "response": response_content,
@@ -1075,21 +1432,28 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/chats/{session_id}")
-async def get_chat_history(session_id: str):
-    """Get chat history for a session"""
+async def get_chat_history(session_id: str, limit: int = 100, before: Optional[datetime] = None):
+    """Get chat history for a session, oldest first
+    
+    Returns the most recent `limit` chats; pass the oldest timestamp seen as
+    `before` to page further back.
+    """
+    query = select(Chat).where(Chat.session_id == session_id)
+    if before is not None:
+        query = query.where(Chat.timestamp < before)
+    
     async with get_db_session() as session:
-        result = await session.execute(
-            select(Chat).where(Chat.session_id == session_id)
-        )
+        result = await session.execute(query.order_by(Chat.timestamp.desc()).limit(limit))
         chats = result.scalars().all()
-        return [
-            {
-                "message": chat.message,
-                "response": chat.response,
-                "timestamp": chat.timestamp
-            }
-            for chat in chats
-        ]
+    
+    return ORJSONResponse([
+        {
+            "message": chat.message,
+            "response": chat.response,
+            "timestamp": chat.timestamp
+        }
+        for chat in reversed(chats)
+    ])
 
 # Enhanced network infrastructure endpoints using graph service
 @app.get("/network/graph")
@@ -1097,11 +1461,14 @@ async def get_network_graph():
     """Get complete network graph (nodes and edges)"""
     try:
         graph = await graph_service.get_graph()
-        return {
+        # Encoded straight to bytes; returning the dict would first copy the
+        # whole graph through jsonable_encoder
+        payload = orjson.dumps({
             "nodes": list(graph["nodes"].values()),
             "edges": list(graph["edges"].values()),
             "last_updated": graph["last_updated"]
-        }
+        }, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        return Response(payload, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1136,7 +1503,7 @@ async def get_network_stats():
 async def create_network_node(node_data: NetworkNodeData):
     """Create a new network node"""
     try:
-        node = await graph_service.create_node(node_data.dict(), source="api")
+        node = await graph_service.create_node(node_data.model_dump(exclude_unset=True), source="api")
         return {"success": True, "node": node}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1145,7 +1512,7 @@ async def create_network_node(node_data: NetworkNodeData):
 async def update_network_node(node_id: str, node_data: NetworkNodeData):
     """Update a network node"""
     try:
-        node = await graph_service.update_node(node_id, node_data.dict(), source="api")
+        node = await graph_service.update_node(node_id, node_data.model_dump(), source="api")
         return {"success": True, "node": node}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -1168,7 +1535,7 @@ async def delete_network_node(node_id: str):
 async def create_network_edge(edge_data: NetworkEdgeData):
     """Create a new network edge"""
     try:
-        edge = await graph_service.create_edge(edge_data.dict(), source="api")
+        edge = await graph_service.create_edge(edge_data.model_dump(exclude_unset=True), source="api")
         return {"success": True, "edge": edge}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1177,7 +1544,7 @@ async def create_network_edge(edge_data: NetworkEdgeData):
 async def update_network_edge(edge_id: str, edge_data: NetworkEdgeData):
     """Update a network edge"""
     try:
-        edge = await graph_service.update_edge(edge_id, edge_data.dict(), source="api")
+        edge = await graph_service.update_edge(edge_id, edge_data.model_dump(), source="api")
         return {"success": True, "edge": edge}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -1197,49 +1564,69 @@ async def delete_network_edge(edge_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Bulk update endpoints for external devices
+# Independent graph writes from one bulk update run this many at a time
+BULK_UPDATE_CONCURRENCY = 16
+
+async def run_bulk_operations(operations: List[tuple], key: str) -> List[Dict[str, Any]]:
+    """Await (action, item id, coroutine factory) triples in bounded concurrent batches
+    
+    Items sharing an id never run in the same batch, so repeated writes to
+    one node or edge apply in request order. A failing item is reported as
+    an error entry instead of failing the rest.
+    """
+    results = []
+    
+    async def run_batch(batch):
+        outcomes = await asyncio.gather(*(factory() for _, _, factory in batch), return_exceptions=True)
+        for (action, _, _), outcome in zip(batch, outcomes):
+            if isinstance(outcome, BaseException):
+                results.append({"action": "error", "error": str(outcome)})
+            else:
+                results.append({"action": action, key: outcome})
+    
+    batch, batch_ids = [], set()
+    for operation in operations:
+        item_id = operation[1]
+        if len(batch) == BULK_UPDATE_CONCURRENCY or (item_id is not None and item_id in batch_ids):
+            await run_batch(batch)
+            batch, batch_ids = [], set()
+        batch.append(operation)
+        if item_id is not None:
+            batch_ids.add(item_id)
+    if batch:
+        await run_batch(batch)
+    return results
+
 @app.post("/network/bulk-update")
 async def bulk_update_graph(update_request: GraphUpdateRequest):
     """Bulk update endpoint for external devices to push changes"""
     try:
-        results = {"nodes": [], "edges": []}
-        
-        # Process node updates
-        if update_request.nodes:
-            for node_data in update_request.nodes:
-                if "id" in node_data and node_data["id"]:
-                    # Update existing node
-                    node = await graph_service.update_node(
-                        str(node_data["id"]), 
-                        node_data, 
-                        source=update_request.source
-                    )
-                    results["nodes"].append({"action": "updated", "node": node})
-                else:
-                    # Create new node
-                    node = await graph_service.create_node(
-                        node_data, 
-                        source=update_request.source
-                    )
-                    results["nodes"].append({"action": "created", "node": node})
-        
-        # Process edge updates
-        if update_request.edges:
-            for edge_data in update_request.edges:
-                if "id" in edge_data and edge_data["id"]:
-                    # Update existing edge
-                    edge = await graph_service.update_edge(
-                        str(edge_data["id"]), 
-                        edge_data, 
-                        source=update_request.source
-                    )
-                    results["edges"].append({"action": "updated", "edge": edge})
-                else:
-                    # Create new edge
-                    edge = await graph_service.create_edge(
-                        edge_data, 
-                        source=update_request.source
-                    )
-                    results["edges"].append({"action": "created", "edge": edge})
+        nodes = NODE_LIST_ADAPTER.validate_python(update_request.nodes or [])
+        edges = EDGE_LIST_ADAPTER.validate_python(update_request.edges or [])
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    
+    try:
+        # Only the fields each device sent are passed on, so updates stay partial
+        node_items = [node.model_dump(exclude_unset=True) for node in nodes]
+        edge_items = [edge.model_dump(exclude_unset=True) for edge in edges]
+        
+        # Nodes go first so edges can refer to nodes created in this request
+        node_operations = [
+            ("updated", str(node_data["id"]), partial(graph_service.update_node, str(node_data["id"]), node_data, source=update_request.source))
+            if "id" in node_data and node_data["id"] else
+            ("created", None, partial(graph_service.create_node, node_data, source=update_request.source))
+            for node_data in node_items
+        ]
+        results = {"nodes": await run_bulk_operations(node_operations, "node")}
+        
+        edge_operations = [
+            ("updated", str(edge_data["id"]), partial(graph_service.update_edge, str(edge_data["id"]), edge_data, source=update_request.source))
+            if "id" in edge_data and edge_data["id"] else
+            ("created", None, partial(graph_service.create_edge, edge_data, source=update_request.source))
+            for edge_data in edge_items
+        ]
+        results["edges"] = await run_bulk_operations(edge_operations, "edge")
         
         return {
             "success": True,
@@ -1255,13 +1642,7 @@ async def device_update(device_id: str, update_data: Dict[str, Any]):
     """Simple endpoint for external devices to send updates"""
     try:
         # Find or create node for this device
-        existing_node = None
-        nodes = await graph_service.get_nodes()
-        
-        for node in nodes:
-            if node.get("metadata", {}).get("device_id") == device_id:
-                existing_node = node
-                break
+        existing_node = await graph_service.get_node_by_device_id(device_id)
         
         # Prepare node data
         node_data = {
@@ -1316,9 +1697,9 @@ async def test_stream():
     """Test SSE streaming"""
     async def generate():
         for i in range(5):
-            yield f"data: {json.dumps({'count': i, 'message': f'Test message {i}'})}\n\n"
+            yield b"data: " + orjson.dumps({'count': i, 'message': f'Test message {i}'}) + b"\n\n"
             await asyncio.sleep(1)
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        yield DONE_FRAME
     
     return StreamingResponse(
         generate(),
@@ -1399,11 +1780,7 @@ async def get_logs(
             log_message = source.get("log", "")
             
             # Infer log level from content
-            level = "INFO"
-            if any(keyword in log_message.lower() for keyword in ["error", "fail", "exception"]):
-                level = "ERROR"
-            elif any(keyword in log_message.lower() for keyword in ["warn", "warning"]):
-                level = "WARN"
+            level = infer_log_level(log_message)
             
             result_logs.append(LogEntry(
                 id=hit.get("_id", ""),
@@ -1421,7 +1798,7 @@ async def get_logs(
         
         return result_logs
     except Exception as e:
-        print(f"Error fetching logs: {e}")
+        logger.error("Error fetching logs: %s", e)
         return []
 
 @app.get("/logs/recent", response_model=List[LogEntry])
@@ -1432,12 +1809,7 @@ async def get_recent_logs(minutes: int = 30, size: int = 50):
 @app.get("/metrics")
 async def get_current_metrics():
     """Get current network metrics from cache"""
-    global network_metrics_cache, last_metrics_update
-    
-    # Fetch fresh metrics if cache is empty or old
-    if not network_metrics_cache or not last_metrics_update or \
-       (datetime.now() - last_metrics_update).seconds > 60:
-        await fetch_metrics_from_opensearch()
+    await fetch_metrics_from_opensearch()
     
     return {
         "metrics": network_metrics_cache,
@@ -1450,7 +1822,7 @@ async def force_network_sync():
     """Force sync network topology from MetricBeat data"""
     try:
         await clear_bad_data()
-        await fetch_metrics_from_opensearch()
+        await refresh_metrics()
         await sync_network_topology_from_metrics()
         return {"success": True, "message": "Network topology synced from MetricBeat data"}
     except Exception as e:
@@ -1538,9 +1910,7 @@ async def get_error_logs(hours: int = 24, size: int = 100):
             log_message = source.get("log", "")
             
             # Determine error level from content
-            level = "ERROR"
-            if any(keyword in log_message.lower() for keyword in ["warn", "warning"]):
-                level = "WARN"
+            level = "WARN" if WARN_LOG_RE.search(log_message) else "ERROR"
                 
             result_logs.append(LogEntry(
                 id=hit.get("_id", ""),
@@ -1558,7 +1928,7 @@ async def get_error_logs(hours: int = 24, size: int = 100):
         
         return result_logs
     except Exception as e:
-        print(f"Error fetching error logs: {e}")
+        logger.error("Error fetching error logs: %s", e)
         return []
 
 @app.get("/logs/node/{node_id}", response_model=List[LogEntry])
@@ -1595,11 +1965,7 @@ async def get_node_logs(node_id: str, hours: int = 24, size: int = 50):
             log_message = source.get("log", "")
             
             # Infer log level from content
-            level = "INFO"
-            if any(keyword in log_message.lower() for keyword in ["error", "fail", "exception"]):
-                level = "ERROR"
-            elif any(keyword in log_message.lower() for keyword in ["warn", "warning"]):
-                level = "WARN"
+            level = infer_log_level(log_message)
                 
             result_logs.append(LogEntry(
                 id=hit.get("_id", ""),
@@ -1617,7 +1983,7 @@ async def get_node_logs(node_id: str, hours: int = 24, size: int = 50):
         
         return result_logs
     except Exception as e:
-        print(f"Error fetching node logs: {e}")
+        logger.error("Error fetching node logs: %s", e)
         return []
 
 @app.post("/logs/search", response_model=List[LogEntry])
@@ -1637,18 +2003,13 @@ async def search_logs(query: LogQuery):
 async def get_log_stats():
     """Get log statistics and counts"""
     try:
-        session = get_opensearch_session()
-        
-        # Get total count across all log indexes
-        total_count = 0
-        for index in ["client-logs", "frr-router-logs", "server-logs", "switch1-logs", "switch2-logs"]:
-            url = f"{OPENSEARCH_BASE_URL}/{index}/_count"
-            response = session.get(url, timeout=10)
-            if response.status_code == 200:
-                total_count += response.json().get("count", 0)
+        log_indexes = ["client-logs", "frr-router-logs", "server-logs", "switch1-logs", "switch2-logs"]
+        count_query = {"size": 0, "track_total_hits": True}
         
         # Get recent activity count
         recent_query = {
+            "size": 0,
+            "track_total_hits": True,
             "query": {
                 "range": {
                     "@timestamp": {
@@ -1658,9 +2019,16 @@ async def get_log_stats():
             }
         }
         
-        url = f"{OPENSEARCH_BASE_URL}/*-logs/_count"
-        response = session.post(url, json=recent_query, headers={"Content-Type": "application/json"})
-        recent_count = response.json().get("count", 0) if response.status_code == 200 else 0
+        # Per-index totals and the recent count in a single request
+        responses = await opensearch_msearch(
+            [(index, count_query) for index in log_indexes] + [("*-logs", recent_query)]
+        )
+        counts = [
+            0 if "error" in result else result["hits"]["total"]["value"]
+            for result in responses
+        ]
+        total_count = sum(counts[:-1])
+        recent_count = counts[-1]
         
         return {
             "total_logs": total_count,
@@ -1680,4 +2048,9 @@ async def get_log_stats():
         }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=3001) 
\ No newline at end of file
+    # uvloop and httptools ship with uvicorn[standard]; ask for them explicitly
+    # so a missing install fails loudly instead of silently using asyncio/h11.
+    # Access logs are off: a formatted line per request costs more than it
+    # tells us. Stay at one worker, since the graph cache, chat history cache
+    # and WebSocket registry all live in this process
+    uvicorn.run(app, host="0.0.0.0", port=3001, loop="uvloop", http="httptools", ws="websockets", access_log=False) 
\ No newline at end of file
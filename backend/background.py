@@ -0,0 +1,13 @@
+import asyncio
+from typing import Coroutine, Set
+
+# The event loop only keeps weak references to tasks, so fire-and-forget
+# tasks are held here until they finish or they may be garbage collected
+_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro: Coroutine) -> asyncio.Task:
+    """Schedule a coroutine as a task and keep it alive until it completes"""
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
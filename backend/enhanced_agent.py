@@ -1,13 +1,19 @@
 import os
 from typing import Dict, Any, Optional, AsyncGenerator, List
 from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
+from openai import DefaultAsyncHttpxClient
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, BaseMessage
-from langchain_core.tools import Tool
+from langchain_core.tools import StructuredTool
 from dotenv import load_dotenv
 import asyncio
-import json
+import orjson
+import logging
+from collections import OrderedDict, deque
+from functools import lru_cache, wraps
+from itertools import count
 
+from http_clients import HTTP2, HTTP_LIMITS, HTTP_TIMEOUT
+from memory import MAX_CACHED_SESSIONS
 from tools import (
     get_network_status, 
     create_ansible_playbook, 
@@ -19,40 +25,97 @@ from tools import (
 
 load_dotenv()
 
-# Initialize Llama model with OpenAI compatibility
+logger = logging.getLogger(__name__)
+
+# Use OpenAI when a key is configured, otherwise the Llama API through its
+# OpenAI-compatible endpoint; only the selected client is constructed
+LLM_PROVIDER = "openai" if os.getenv("OPENAI_API_KEY") else "llama"
+
+# Provider differences are settled here, once, rather than on each request
+if LLM_PROVIDER == "openai":
+    _provider_kwargs = {
+        "api_key": os.getenv("OPENAI_API_KEY"),
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    }
+    
+    def stream_kwargs(session_id: str) -> Dict[str, Any]:
+        # Keying the prompt cache on the session routes follow-up turns to
+        # the server that already holds this conversation's prefix
+        return {"extra_body": {"prompt_cache_key": session_id}}
+else:
+    _provider_kwargs = {
+        "api_key": os.getenv("LLAMA_API_KEY", "dummy-key"),
+        "base_url": "https://api.llama.com/compat/v1/",
+        "model": "Llama-4-Maverick-17B-128E-Instruct-FP8"
+    }
+    
+    def stream_kwargs(session_id: str) -> Dict[str, Any]:
+        # The Llama compat endpoint has no prompt_cache_key
+        return {}
+
 llm = ChatOpenAI(
-    api_key=os.getenv("LLAMA_API_KEY", "dummy-key"),
-    base_url="https://api.llama.com/compat/v1/",
-    model="Llama-4-Maverick-17B-128E-Instruct-FP8",
+    **_provider_kwargs,
     temperature=0.6,
     max_tokens=2048,
     model_kwargs={
         "top_p": 0.9,
         "frequency_penalty": 1
     },
-    streaming=True
+    streaming=True,
+    # One pooled async client, shared by every model bound from this one
+    http_async_client=DefaultAsyncHttpxClient(http2=HTTP2, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
 )
 
-def make_sync_tool(async_func):
-    """Wrapper to make async tools work with sync agent"""
-    def sync_wrapper(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(async_func(*args, **kwargs))
-        finally:
-            loop.close()
-    
-    return Tool(
-        name=async_func.name,
-        description=async_func.description,
-        func=sync_wrapper
+# Per-session LangChain message history, kept across turns so each request
+# only appends the new messages instead of rebuilding the whole history
+SESSION_HISTORY_SIZE = 20
+SESSION_MSGS: "OrderedDict[str, deque]" = OrderedDict()
+
+# Upper bounds on how long / how much text is buffered before a text event
+STREAM_BATCH_SECONDS = 0.04
+STREAM_BATCH_CHARS = 256
+
+def make_async_tool(async_func):
+    """Expose an async tool to LangChain without a sync bridge; the agent
+    awaits it on the request's own event loop"""
+    
+    @wraps(async_func)
+    async def tool_wrapper(*args, **kwargs):
+        result = await async_func(*args, **kwargs)
+        # Serialize structured results here with orjson rather than leaving
+        # it to LangChain's json.dumps when building the ToolMessage
+        if isinstance(result, (dict, list)):
+            return orjson.dumps(result, default=str).decode()
+        return result
+    
+    return StructuredTool.from_function(
+        coroutine=tool_wrapper,
+        name=async_func.__name__,
+        description=async_func.__doc__ or async_func.__name__
     )
 
-def build_context_aware_system_prompt(context: Optional[Dict[str, Any]] = None, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
-    """Build a sophisticated system prompt with context awareness"""
+def build_context_aware_system_prompt(context: Optional[Dict[str, Any]] = None) -> str:
+    """Build a sophisticated system prompt with context awareness
+    
+    Conversation history is sent as messages rather than summarized here, so
+    the system prompt stays identical across turns and remains cacheable.
+    """
+    
+    stats = context.get("network_stats") if context else None
+    node = context.get("focused_node") if context else None
     
-    base_prompt = """You are an expert network infrastructure assistant with deep knowledge of:
+    stats_key = (stats.get('total_nodes', 0), stats.get('active', 0), stats.get('issues', 0)) if stats else None
+    node_key = (
+        node.get('label', 'Unknown'),
+        node.get('type', 'Unknown'),
+        node.get('status', 'Unknown'),
+        node.get('ip', 'Not specified'),
+        node.get('layer', 'Unknown')
+    ) if node else None
+    
+    return _build_context_prompt(stats_key, node_key)
+
+_ENHANCED_BASE_PROMPT = """You are an expert network infrastructure assistant with deep knowledge of:
 - Network troubleshooting and diagnostics
 - SSH command execution and system administration
 - Ansible automation and configuration management
@@ -72,60 +135,82 @@ Your communication style is:
 - Educational when appropriate
 - Proactive in suggesting improvements"""
 
+@lru_cache(maxsize=64)
+def _build_context_prompt(stats: Optional[tuple], node: Optional[tuple]) -> str:
+    """Build the system prompt from hashable context fields"""
+    parts = [_ENHANCED_BASE_PROMPT]
+    
     # Add network context if available
-    if context and context.get("network_stats"):
-        stats = context["network_stats"]
-        base_prompt += f"""
+    if stats:
+        total_nodes, active, issues = stats
+        parts.append(f"""CURRENT NETWORK STATE:
+- Total nodes: {total_nodes}
+- Active nodes: {active}
+- Nodes with issues: {issues}
+- Network health: {((active / max(total_nodes, 1)) * 100):.1f}%""")
+    
+    # Add focused node context
+    if node:
+        label, node_type, status, ip, layer = node
+        parts.append(f"""FOCUSED NODE: {label}
+- Type: {node_type}
+- Status: {status}
+- IP: {ip}
+- Layer: {layer}
 
-CURRENT NETWORK STATE:
-- Total nodes: {stats.get('total_nodes', 0)}
-- Active nodes: {stats.get('active', 0)}
-- Nodes with issues: {stats.get('issues', 0)}
-- Network health: {((stats.get('active', 0) / max(stats.get('total_nodes', 1), 1)) * 100):.1f}%"""
+Pay special attention to this node in your responses and suggestions.""")
+    
+    return "\n\n".join(parts)
 
-    # Add focused node context
-    if context and context.get("focused_node"):
-        node = context["focused_node"]
-        base_prompt += f"""
-
-FOCUSED NODE: {node.get('label', 'Unknown')}
-- Type: {node.get('type', 'Unknown')}
-- Status: {node.get('status', 'Unknown')}
-- IP: {node.get('ip', 'Not specified')}
-- Layer: {node.get('layer', 'Unknown')}
-
-Pay special attention to this node in your responses and suggestions."""
-
-    # Add conversation context for memory
-    if conversation_history and len(conversation_history) > 0:
-        base_prompt += "\n\nRECENT CONVERSATION CONTEXT:"
-        for i, msg in enumerate(conversation_history[-5:]):  # Last 5 messages for context
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '')[:200]  # Truncate long messages
-            base_prompt += f"\n{i+1}. {role.title()}: {content}..."
-        
-        base_prompt += "\n\nUse this conversation history to provide contextual, relevant responses."
+# Enhanced tool set with better descriptions, wrapped once at import;
+# create_ansible_playbook is synchronous and is used as-is
+ENHANCED_TOOLS = [
+    make_async_tool(get_network_status),
+    make_async_tool(get_node_details),
+    make_async_tool(update_node_status),
+    create_ansible_playbook,
+    make_async_tool(execute_ssh_command),
+    make_async_tool(run_ansible_playbook)
+]
 
-    return base_prompt
+def _tool_name(tool) -> str:
+    return getattr(tool, "name", None) or tool.__name__
 
-def create_enhanced_agent(context: Optional[Dict[str, Any]] = None, conversation_history: Optional[List[Dict[str, str]]] = None):
-    """Create an enhanced streaming agent with sophisticated context awareness"""
+ALL_TOOL_NAMES = frozenset(_tool_name(tool) for tool in ENHANCED_TOOLS)
+
+# Model with the full tool set bound once, so tool schemas are serialized at import
+BOUND_LLM = llm.bind_tools(ENHANCED_TOOLS)
+
+@lru_cache(maxsize=4)
+def get_react_agent(tool_names: frozenset):
+    """Compile the ReAct graph once per distinct tool set"""
+    # LangGraph is only needed once a graph is actually built, so keep it off
+    # the import path of the module
+    from langgraph.prebuilt import create_react_agent
     
-    # Enhanced tool set with better descriptions
-    tools = [
-        make_sync_tool(get_network_status),
-        make_sync_tool(get_node_details),
-        make_sync_tool(update_node_status),
-        create_ansible_playbook,
-        make_sync_tool(execute_ssh_command),
-        make_sync_tool(run_ansible_playbook)
-    ]
+    tools = [tool for tool in ENHANCED_TOOLS if _tool_name(tool) in tool_names]
+    model = BOUND_LLM if tool_names == ALL_TOOL_NAMES else llm.bind_tools(tools)
+    return create_react_agent(model, tools)
+
+async def warm_up():
+    """Open the provider connection ahead of the first chat request"""
+    try:
+        await llm.root_async_client.models.list()
+    except Exception as e:
+        logger.warning("%s warm-up failed: %s", LLM_PROVIDER, e)
+
+async def close_clients():
+    """Close the pooled HTTP client on shutdown"""
+    await llm.http_async_client.aclose()
+
+def create_enhanced_agent(context: Optional[Dict[str, Any]] = None):
+    """Create an enhanced streaming agent with sophisticated context awareness"""
     
     # Build context-aware system prompt
-    system_prompt = build_context_aware_system_prompt(context, conversation_history)
+    system_prompt = build_context_aware_system_prompt(context)
     
-    # Create agent with enhanced prompting
-    agent = create_react_agent(llm, tools)
+    # The graph doesn't depend on context, so it is shared across requests
+    agent = get_react_agent(ALL_TOOL_NAMES)
     
     return agent, system_prompt
 
@@ -139,29 +224,57 @@ async def enhanced_streaming_chat(
     
     try:
         # Create enhanced agent with context
-        agent, system_prompt = create_enhanced_agent(context, conversation_history)
-        
-        # Build message history for better context
-        messages = [SystemMessage(content=system_prompt)]
+        agent, system_prompt = create_enhanced_agent(context)
         
-        # Add recent conversation history as context
-        if conversation_history:
-            for hist_msg in conversation_history[-10:]:  # Last 10 messages
-                if hist_msg.get('role') == 'user':
-                    messages.append(HumanMessage(content=hist_msg.get('content', '')))
-                elif hist_msg.get('role') == 'assistant':
-                    messages.append(AIMessage(content=hist_msg.get('content', '')))
+        # Reuse the session's message objects, seeding them from the
+        # conversation history the first time the session is seen
+        history = SESSION_MSGS.get(session_id)
+        if history is None:
+            history = deque(maxlen=SESSION_HISTORY_SIZE)
+            for hist_msg in conversation_history or []:
+                role = hist_msg.get('role')
+                if role == 'user':
+                    history.append(HumanMessage(content=hist_msg.get('content', '')))
+                elif role == 'assistant':
+                    history.append(AIMessage(content=hist_msg.get('content', '')))
+            SESSION_MSGS[session_id] = history
+            if len(SESSION_MSGS) > MAX_CACHED_SESSIONS:
+                SESSION_MSGS.popitem(last=False)
+        else:
+            SESSION_MSGS.move_to_end(session_id)
         
         # Add current message
-        messages.append(HumanMessage(content=message))
+        history.append(HumanMessage(content=message))
+        messages = [SystemMessage(content=system_prompt), *history]
         
         # Stream initial acknowledgment
         yield {"type": "text", "content": ""}
         
         # Get agent response with streaming
-        async for chunk in llm.astream(messages):
-            if chunk.content:
-                yield {"type": "text", "content": chunk.content}
+        # Tokens are coalesced into short time/size-bounded batches so the
+        # caller sees one event per burst instead of one per token
+        loop = asyncio.get_running_loop()
+        response_parts = []
+        buffer = []
+        buffered = 0
+        last_flush = loop.time()
+        async for chunk in llm.astream(messages, **stream_kwargs(session_id)):
+            text = chunk.content
+            if not text:
+                continue
+            response_parts.append(text)
+            buffer.append(text)
+            buffered += len(text)
+            if buffered > STREAM_BATCH_CHARS or loop.time() - last_flush > STREAM_BATCH_SECONDS:
+                yield {"type": "text", "content": "".join(buffer)}
+                buffer.clear()
+                buffered = 0
+                last_flush = loop.time()
+        
+        if buffer:
+            yield {"type": "text", "content": "".join(buffer)}
+        
+        history.append(AIMessage(content="".join(response_parts)))
         
         # Check if we should suggest proactive actions
         await suggest_proactive_actions(message, context)
@@ -169,9 +282,24 @@ async def enhanced_streaming_chat(
         yield {"type": "done"}
         
     except Exception as e:
-        print(f"Enhanced chat error: {str(e)}")
+        logger.exception("Enhanced chat error")
         yield {"type": "error", "error": str(e)}
 
+async def batch_chat(prompts: List[str], context: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Answer independent, tool-free prompts concurrently in a single batch"""
+    
+    system_prompt = build_context_aware_system_prompt(context)
+    
+    # Identical prompts are only sent once and share the answer
+    unique_prompts = list(dict.fromkeys(prompts))
+    responses = await llm.abatch([
+        [SystemMessage(content=system_prompt), HumanMessage(content=prompt)]
+        for prompt in unique_prompts
+    ])
+    
+    answers = {prompt: response.content for prompt, response in zip(unique_prompts, responses)}
+    return [answers[prompt] for prompt in prompts]
+
 async def suggest_proactive_actions(message: str, context: Optional[Dict[str, Any]] = None) -> AsyncGenerator[Dict[str, Any], None]:
     """Suggest proactive actions based on the conversation and context"""
     
@@ -209,6 +337,9 @@ async def suggest_proactive_actions(message: str, context: Optional[Dict[str, An
                 "message": f"I notice there are {stats['issues']} nodes with issues. Should I investigate them?"
             }
 
+# Unique within the process and cheap to generate, unlike hashing the args
+_CALL_IDS = count(1)
+
 async def enhanced_tool_execution_with_streaming(
     tool_name: str, 
     args: Dict[str, Any],
@@ -216,11 +347,12 @@ async def enhanced_tool_execution_with_streaming(
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """Execute tools with streaming output and enhanced error handling"""
     
+    tool_call_id = f"call_{tool_name}_{next(_CALL_IDS)}"
     try:
         # Announce tool execution
         yield {
             "type": "tool_call",
-            "toolCallId": f"call_{tool_name}_{hash(str(args))}",
+            "toolCallId": tool_call_id,
             "toolName": tool_name,
             "args": args
         }
@@ -237,14 +369,14 @@ async def enhanced_tool_execution_with_streaming(
             result = await execute_tool_sync(tool_name, args)
             yield {
                 "type": "tool_result",
-                "toolCallId": f"call_{tool_name}_{hash(str(args))}",
+                "toolCallId": tool_call_id,
                 "result": result
             }
             
     except Exception as e:
         yield {
             "type": "tool_error",
-            "toolCallId": f"call_{tool_name}_{hash(str(args))}",
+            "toolCallId": tool_call_id,
             "error": str(e)
         }
 
@@ -319,23 +451,30 @@ async def stream_ansible_execution(args: Dict[str, Any]) -> AsyncGenerator[Dict[
             "error": str(e)
         }
 
+def _make_dispatch(tool_func):
+    """Resolve once whether a tool is awaited directly or run in a thread"""
+    if asyncio.iscoroutinefunction(tool_func):
+        return lambda args: tool_func(**args)
+    return lambda args: asyncio.to_thread(tool_func, **args)
+
+# tool name -> callable taking the args dict and returning an awaitable
+_TOOL_DISPATCH = {
+    tool_func.__name__: _make_dispatch(tool_func)
+    for tool_func in (
+        get_network_status,
+        get_node_details,
+        update_node_status,
+        create_ansible_playbook,
+        execute_ssh_command,
+        run_ansible_playbook
+    )
+}
+
 async def execute_tool_sync(tool_name: str, args: Dict[str, Any]) -> Any:
-    """Execute a tool synchronously"""
-    
-    tools_map = {
-        "get_network_status": get_network_status,
-        "get_node_details": get_node_details,
-        "update_node_status": update_node_status,
-        "create_ansible_playbook": create_ansible_playbook,
-        "execute_ssh_command": execute_ssh_command,
-        "run_ansible_playbook": run_ansible_playbook
-    }
+    """Execute a tool by name with given arguments"""
     
-    if tool_name in tools_map:
-        tool_func = tools_map[tool_name]
-        if asyncio.iscoroutinefunction(tool_func):
-            return await tool_func(**args)
-        else:
-            return tool_func(**args)
-    else:
-        raise ValueError(f"Unknown tool: {tool_name}") 
\ No newline at end of file
+    dispatch = _TOOL_DISPATCH.get(tool_name)
+    if dispatch is None:
+        raise ValueError(f"Unknown tool: {tool_name}")
+    
+    return await dispatch(args)
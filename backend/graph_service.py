@@ -1,4 +1,5 @@
 from typing import Dict, List, Optional, Any, Tuple
+import asyncio
 from datetime import datetime
 from sqlalchemy import select, delete
 from sqlalchemy.orm import selectinload
@@ -17,10 +18,18 @@ class GraphService:
             "last_updated": None
         }
         self._cache_valid = False
+        # External device id (node metadata "device_id") -> node id, rebuilt
+        # with the cache so device updates don't scan every node
+        self._device_index: Dict[str, str] = {}
+        # Bumped on every mutation so callers can cache data derived from the graph
+        self.version = 0
+        # Serializes reloads so a slow, older load can't replace a newer one
+        self._reload_lock = asyncio.Lock()
     
     async def _invalidate_cache(self):
         """Invalidate the graph cache"""
         self._cache_valid = False
+        self.version += 1
     
     async def _load_graph_from_db(self) -> Dict[str, Any]:
         """Load the complete graph from database"""
@@ -82,11 +91,28 @@ class GraphService:
     
     async def get_graph(self, force_reload: bool = False) -> Dict[str, Any]:
         """Get the current graph state"""
-        if not self._cache_valid or force_reload:
-            self._graph_cache = await self._load_graph_from_db()
-            self._cache_valid = True
+        if self._cache_valid and not force_reload:
+            return self._graph_cache
         
-        return self._graph_cache
+        async with self._reload_lock:
+            # Another caller may have reloaded while we waited for the lock
+            if self._cache_valid and not force_reload:
+                return self._graph_cache
+            
+            version = self.version
+            graph = await self._load_graph_from_db()
+            self._graph_cache = graph
+            # Reversed so the first node registered for a device wins
+            self._device_index = {
+                node["metadata"]["device_id"]: node_id
+                for node_id, node in reversed(graph["nodes"].items())
+                if "device_id" in node["metadata"]
+            }
+            # A mutation committed during the load may be missing from it,
+            # so only trust the cache if nothing changed in the meantime
+            self._cache_valid = self.version == version
+        
+        return graph
     
     async def get_nodes(self) -> List[Dict[str, Any]]:
         """Get all nodes"""
@@ -103,6 +129,12 @@ class GraphService:
         graph = await self.get_graph()
         return graph["nodes"].get(node_id)
     
+    async def get_node_by_device_id(self, device_id: str) -> Optional[Dict[str, Any]]:
+        """Get the node registered for an external device, if any"""
+        graph = await self.get_graph()
+        node_id = self._device_index.get(device_id)
+        return graph["nodes"].get(node_id) if node_id is not None else None
+    
     async def get_edge(self, edge_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific edge"""
         graph = await self.get_graph()
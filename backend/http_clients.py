@@ -0,0 +1,28 @@
+import importlib.util
+from typing import Optional
+
+import httpx
+
+# HTTP/2 lets concurrent streams share one connection; it needs the optional
+# h2 package (httpx[http2]), so fall back to HTTP/1.1 keep-alive without it
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Shared by the LLM clients so concurrent sessions reuse pooled connections
+# instead of each paying for its own TLS handshake
+HTTP_LIMITS = httpx.Limits(max_connections=256, max_keepalive_connections=64)
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+
+# Backend's own outbound calls (tools hitting the API and the like) share one
+# async client; created on first use and closed by the app on shutdown
+_async_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it if needed"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            http2=HTTP2,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+    return _async_client
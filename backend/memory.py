@@ -0,0 +1,134 @@
+import os
+import re
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cheap model used for fact extraction; the chat model is not needed for this
+MEMORY_MODEL = os.getenv("MEMORY_MODEL", "Llama-3.3-8B-Instruct")
+MAX_FACTS_PER_SESSION = 200
+# Sessions whose per-session state is kept in memory; the least recently
+# used session is evicted beyond this
+MAX_CACHED_SESSIONS = 1024
+
+EXTRACTION_PROMPT = """Extract the durable facts from this exchange between a user and a network assistant.
+Only include facts worth remembering for later turns: device names, IPs, statuses, user preferences, decisions and outcomes of actions.
+Return one short fact per line with no numbering. Return nothing if there is nothing worth remembering."""
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a network assistant.
+Merge the existing summary with the new messages into one concise paragraph of at most 120 words.
+Keep device names, IPs, problems found, actions taken and open questions. Return only the summary."""
+
+_WORD_RE = re.compile(r"[a-z0-9_.\-]+")
+
+# session_id -> list of (fact, tokens)
+_facts: "OrderedDict[str, List[tuple]]" = OrderedDict()
+
+# session_id -> running summary of messages that fell out of the history window
+_summaries: "OrderedDict[str, str]" = OrderedDict()
+_summary_locks: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+
+def _tokens(text: str) -> frozenset:
+    return frozenset(_WORD_RE.findall(text.lower()))
+
+def extract_facts(user_msg: str, assistant_msg: str) -> List[str]:
+    """Ask the memory model for atomic facts from one user/assistant exchange"""
+    from agent import llm
+
+    response = llm.chat.completions.create(
+        model=MEMORY_MODEL,
+        messages=[
+            {"role": "system", "content": EXTRACTION_PROMPT},
+            {"role": "user", "content": f"User: {user_msg}\n\nAssistant: {assistant_msg}"}
+        ],
+        temperature=0,
+        max_completion_tokens=256
+    )
+    content = response.completion_message.content
+    text = getattr(content, "text", content) or ""
+    return [line.strip("-• ").strip() for line in str(text).splitlines() if line.strip("-• ").strip()]
+
+async def remember(session_id: str, user_msg: str, assistant_msg: str):
+    """Extract facts from a finished turn and add them to the session's memory"""
+    try:
+        facts = await asyncio.to_thread(extract_facts, user_msg, assistant_msg)
+    except Exception as e:
+        logger.warning("Fact extraction failed for session %s: %s", session_id, e)
+        return
+
+    stored = _facts.get(session_id)
+    if stored is None:
+        stored = _facts[session_id] = []
+        if len(_facts) > MAX_CACHED_SESSIONS:
+            _facts.popitem(last=False)
+    else:
+        _facts.move_to_end(session_id)
+    known = {fact for fact, _ in stored}
+    for fact in facts:
+        if fact not in known:
+            stored.append((fact, _tokens(fact)))
+            known.add(fact)
+    del stored[:-MAX_FACTS_PER_SESSION]
+
+def retrieve(session_id: str, query: str, k: int = 5) -> List[str]:
+    """Return the k stored facts that share the most terms with the query"""
+    stored = _facts.get(session_id)
+    if not stored:
+        return []
+    _facts.move_to_end(session_id)
+
+    query_tokens = _tokens(query)
+    scored = [
+        (len(query_tokens & tokens) / (len(tokens) or 1), index)
+        for index, (_, tokens) in enumerate(stored)
+    ]
+    # Ties go to the most recent fact
+    scored.sort(reverse=True)
+    return [stored[index][0] for score, index in scored[:k] if score > 0] or [fact for fact, _ in stored[-k:]]
+
+def summarize_messages(summary: str, messages: List[Dict[str, str]]) -> str:
+    """Fold older messages into the running summary using the memory model"""
+    from agent import llm
+    
+    transcript = "\n".join(f"{msg.get('role', 'unknown').title()}: {msg.get('content', '')}" for msg in messages)
+    response = llm.chat.completions.create(
+        model=MEMORY_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ],
+        temperature=0,
+        max_completion_tokens=256
+    )
+    content = response.completion_message.content
+    return str(getattr(content, "text", content) or "").strip()
+
+async def update_summary(session_id: str, messages: List[Dict[str, str]]):
+    """Merge messages dropped from the history window into the session summary"""
+    lock = _summary_locks.get(session_id)
+    if lock is None:
+        lock = _summary_locks[session_id] = asyncio.Lock()
+        if len(_summary_locks) > MAX_CACHED_SESSIONS:
+            _summary_locks.popitem(last=False)
+    else:
+        _summary_locks.move_to_end(session_id)
+    async with lock:
+        try:
+            summary = await asyncio.to_thread(summarize_messages, _summaries.get(session_id, ""), messages)
+        except Exception as e:
+            logger.warning("Summary update failed for session %s: %s", session_id, e)
+            return
+        if summary:
+            _summaries[session_id] = summary
+            _summaries.move_to_end(session_id)
+            if len(_summaries) > MAX_CACHED_SESSIONS:
+                _summaries.popitem(last=False)
+
+def get_summary(session_id: str) -> Optional[str]:
+    summary = _summaries.get(session_id)
+    if summary is not None:
+        _summaries.move_to_end(session_id)
+    return summary
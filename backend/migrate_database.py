@@ -52,7 +52,10 @@ async def migrate_database():
             source VARCHAR DEFAULT 'unknown',
             timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-        """
+        """,
+        
+        # Index chat history lookups by session, ordered by time
+        "CREATE INDEX IF NOT EXISTS ix_chat_session_ts ON chats (session_id, timestamp)"
     ]
     
     try:
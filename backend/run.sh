@@ -21,4 +21,4 @@ pip install -r requirements.txt
 
 # Run the application
 echo "Starting the backend server..."
-uvicorn app:app --reload --host 0.0.0.0 --port 3001
\ No newline at end of file
+uvicorn app:app --reload --host 0.0.0.0 --port 3001 --loop uvloop --http httptools --no-access-log
\ No newline at end of file
@@ -1,14 +1,19 @@
 import asyncio
-import json
+import orjson
 from typing import Dict, Any, Optional, AsyncGenerator, List
 # Remove langchain dependency - use raw functions
 import paramiko
 import tempfile
 import os
+import threading
+from collections import OrderedDict
 from database import get_db_session, NetworkNode
 from sqlalchemy import select
 from datetime import datetime
-import requests
+import logging
+from http_clients import get_http_client
+
+logger = logging.getLogger(__name__)
 
 # Backend API configuration for AI tools
 BACKEND_API_BASE = "http://localhost:3001"
@@ -198,50 +203,79 @@ def create_ansible_playbook(task_description: str, target_hosts: str = "all") ->
     
     return playbook
 
-async def execute_ssh_command(host: str, command: str, username: str = "admin", password: Optional[str] = None, key_file: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Execute SSH command on a remote host with streaming output support.
-    Returns a dictionary with status and output.
-    """
-    try:
-        # Create SSH client
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        # Connect using password or key
-        connect_params = {
-            "hostname": host,
-            "username": username,
-            "timeout": 30
-        }
-        
-        if key_file:
-            connect_params["key_filename"] = key_file
-        elif password:
-            connect_params["password"] = password
+# Paramiko is blocking, so SSH commands run in worker threads; the semaphore
+# bounds how many threads (and remote sessions) one worker ties up at once
+MAX_CONCURRENT_SSH = int(os.getenv("MAX_CONCURRENT_SSH", "8"))
+_SSH_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_SSH)
+
+# Connected clients, most recently used last, so repeated commands against the
+# same host skip the TCP connect and SSH handshake
+SSH_CLIENT_CACHE_SIZE = 16
+_ssh_clients: "OrderedDict[tuple, paramiko.SSHClient]" = OrderedDict()
+_ssh_clients_lock = threading.Lock()
+
+def _checkout_ssh_client(key: tuple, connect_params: Dict[str, Any]) -> paramiko.SSHClient:
+    """Take a connected client for these parameters, reusing a cached one"""
+    with _ssh_clients_lock:
+        ssh = _ssh_clients.pop(key, None)
+    
+    transport = ssh.get_transport() if ssh is not None else None
+    if transport is not None and transport.is_active():
+        return ssh
+    if ssh is not None:
+        ssh.close()
+    
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    ssh.connect(**connect_params)
+    return ssh
+
+def _release_ssh_client(key: tuple, ssh: paramiko.SSHClient):
+    """Return a client to the cache once its command has finished"""
+    with _ssh_clients_lock:
+        # Another thread already returned a client for the same target
+        if key in _ssh_clients:
+            evicted = [ssh]
         else:
-            # Try to use default SSH key
-            connect_params["key_filename"] = os.path.expanduser("~/.ssh/id_rsa")
-        
-        ssh.connect(**connect_params)
+            _ssh_clients[key] = ssh
+            evicted = []
+            while len(_ssh_clients) > SSH_CLIENT_CACHE_SIZE:
+                evicted.append(_ssh_clients.popitem(last=False)[1])
+    for client in evicted:
+        client.close()
+
+def _execute_ssh_command_blocking(host: str, command: str, username: str, password: Optional[str], key_file: Optional[str]) -> Dict[str, Any]:
+    # Connect using password or key
+    connect_params = {
+        "hostname": host,
+        "username": username,
+        "timeout": 30
+    }
+    
+    if key_file:
+        connect_params["key_filename"] = key_file
+    elif password:
+        connect_params["password"] = password
+    else:
+        # Try to use default SSH key
+        connect_params["key_filename"] = os.path.expanduser("~/.ssh/id_rsa")
+    
+    key = tuple(sorted(connect_params.items()))
+    ssh = None
+    try:
+        ssh = _checkout_ssh_client(key, connect_params)
         
         # Execute command
         stdin, stdout, stderr = ssh.exec_command(command)
         
         # Collect output
-        output_lines = []
-        error_lines = []
-        
-        for line in stdout:
-            output_lines.append(line.strip())
-        
-        for line in stderr:
-            error_lines.append(line.strip())
+        output_lines = [line.strip() for line in stdout]
+        error_lines = [line.strip() for line in stderr]
         
         # Get exit status
         exit_status = stdout.channel.recv_exit_status()
         
-        ssh.close()
+        _release_ssh_client(key, ssh)
         
         return {
             "success": exit_status == 0,
@@ -253,6 +287,9 @@ async def execute_ssh_command(host: str, command: str, username: str = "admin",
         }
         
     except Exception as e:
+        # Don't hand a possibly broken connection to the next command
+        if ssh is not None:
+            ssh.close()
         return {
             "success": False,
             "error": str(e),
@@ -260,6 +297,14 @@ async def execute_ssh_command(host: str, command: str, username: str = "admin",
             "command": command
         }
 
+async def execute_ssh_command(host: str, command: str, username: str = "admin", password: Optional[str] = None, key_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Execute SSH command on a remote host with streaming output support.
+    Returns a dictionary with status and output.
+    """
+    async with _SSH_SEMAPHORE:
+        return await asyncio.to_thread(_execute_ssh_command_blocking, host, command, username, password, key_file)
+
 async def run_ssh_command(host: str, command: str, username: str = "admin", password: Optional[str] = None, key_file: Optional[str] = None) -> Dict[str, Any]:
     """
     Execute SSH command on a remote host with streaming output support.
@@ -273,6 +318,10 @@ async def run_ssh_command(host: str, command: str, username: str = "admin", pass
     """
     return await execute_ssh_command(host, command, username, password, key_file)
 
+# ansible-playbook runs as a subprocess already; cap how many run at once
+MAX_CONCURRENT_ANSIBLE = int(os.getenv("MAX_CONCURRENT_ANSIBLE", "4"))
+_ANSIBLE_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_ANSIBLE)
+
 async def run_ansible_playbook_internal(playbook_content: str, inventory: str = "localhost,", extra_vars: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Execute an Ansible playbook with streaming output support.
@@ -293,17 +342,18 @@ async def run_ansible_playbook_internal(playbook_content: str, inventory: str =
         
         # Add extra vars if provided
         if extra_vars:
-            cmd.extend(["-e", json.dumps(extra_vars)])
+            cmd.extend(["-e", orjson.dumps(extra_vars, default=str).decode()])
         
         # Execute ansible playbook
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # Collect output
-        stdout, stderr = await process.communicate()
+        async with _ANSIBLE_SEMAPHORE:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            
+            # Collect output
+            stdout, stderr = await process.communicate()
         
         # Clean up temporary file
         os.unlink(playbook_path)
@@ -336,33 +386,23 @@ async def run_ansible_playbook(playbook_content: str, inventory: str = "localhos
 
 async def get_recent_logs(device_name: Optional[str] = None, time_range: int = 2, log_level: Optional[str] = None) -> str:
     """Get recent logs from OpenSearch directly"""
-    print(f"=== GET_RECENT_LOGS FUNCTION DEBUG ===")
-    print(f"Received parameters: device_name='{device_name}', time_range={time_range}, log_level='{log_level}'")
+    logger.debug("get_recent_logs: device_name=%r, time_range=%s, log_level=%r", device_name, time_range, log_level)
     try:
         # Import OpenSearch functionality from app.py
-        from app import get_opensearch_session, OPENSEARCH_BASE_URL
-        
-        # Device name to index mapping
-        device_to_index = {
-            "frr-router": "frr-router-logs",
-            "switch1": "switch1-logs", 
-            "switch2": "switch2-logs",
-            "server": "server-logs",
-            "client": "client-logs"
-        }
+        from app import get_opensearch_client, OPENSEARCH_BASE_URL, DEVICE_TO_INDEX, infer_log_level
         
         # Default to searching all log indexes if no specific device
         target_indexes = "*-logs"
         
         if device_name:
             # Map device name to specific index
-            if device_name in device_to_index:
-                target_indexes = device_to_index[device_name]
-                print(f"Mapping device '{device_name}' to index '{target_indexes}'")
+            if device_name in DEVICE_TO_INDEX:
+                target_indexes = DEVICE_TO_INDEX[device_name]
+                logger.debug("Mapping device %r to index %r", device_name, target_indexes)
             else:
                 # Fallback to wildcard search
                 target_indexes = f"*{device_name}*-logs"
-                print(f"Using fallback mapping for device '{device_name}': {target_indexes}")
+                logger.debug("Using fallback mapping for device %r: %s", device_name, target_indexes)
         
         # Build OpenSearch query
         opensearch_query = {
@@ -388,30 +428,26 @@ async def get_recent_logs(device_name: Optional[str] = None, time_range: int = 2
                 "term": {"level": log_level.upper()}
             })
         
-        session = get_opensearch_session()
+        client = get_opensearch_client()
         url = f"{OPENSEARCH_BASE_URL}/{target_indexes}/_search"
         
-        print(f"Querying OpenSearch directly: {url}")
-        print(f"Query: {opensearch_query}")
+        logger.debug("Querying OpenSearch directly: %s", url)
+        logger.debug("Query: %s", opensearch_query)
         
-        response = session.post(url, json=opensearch_query, headers={"Content-Type": "application/json"})
+        response = await client.post(url, content=orjson.dumps(opensearch_query))
         response.raise_for_status()
         
-        data = response.json()
+        data = orjson.loads(response.content)
         logs = []
         
-        print(f"OpenSearch returned {data.get('hits', {}).get('total', {}).get('value', 0)} total hits")
+        logger.debug("OpenSearch returned %s total hits", data.get('hits', {}).get('total', {}).get('value', 0))
         
         for hit in data.get("hits", {}).get("hits", []):
             source = hit["_source"]
             log_message = source.get("log", source.get("message", ""))
             
             # Infer log level from content
-            level = "INFO"
-            if any(keyword in log_message.lower() for keyword in ["error", "fail", "exception"]):
-                level = "ERROR"
-            elif any(keyword in log_message.lower() for keyword in ["warn", "warning"]):
-                level = "WARN"
+            level = infer_log_level(log_message)
             
             logs.append({
                 "id": hit["_id"],
@@ -421,7 +457,7 @@ async def get_recent_logs(device_name: Optional[str] = None, time_range: int = 2
                 "message": log_message,
             })
         
-        print(f"Processed {len(logs)} logs")
+        logger.debug("Processed %d logs", len(logs))
         
         if not logs:
             filter_desc = f"last {time_range} hours"
@@ -430,7 +466,7 @@ async def get_recent_logs(device_name: Optional[str] = None, time_range: int = 2
             if log_level:
                 filter_desc += f" with level {log_level}"
             result = f"No logs found for {filter_desc}"
-            print(f"Returning: {result}")
+            logger.debug("Returning: %s", result)
             return result
         
         # Format logs for display
@@ -468,12 +504,12 @@ async def get_device_info(device_id: str) -> str:
     """Get comprehensive device information including recent logs and metrics"""
     try:
         url = f"{BACKEND_API_BASE}/ai/device-info/{device_id}"
-        response = requests.get(url, timeout=10)
+        response = await get_http_client().get(url, timeout=10)
         
         if response.status_code != 200:
             return f"Failed to get device info: {response.status_code} - {response.text}"
         
-        data = response.json()
+        data = orjson.loads(response.content)
         device = data.get("device", {})
         metrics = data.get("metrics", {})
         recent_logs = data.get("recent_logs", [])
@@ -529,13 +565,13 @@ async def get_device_info(device_id: str) -> str:
 async def get_error_logs(hours: int = 24) -> str:
     """Get error and warning logs from the last N hours"""
     try:
-        url = f"{OPENSEARCH_BASE_URL.replace('http://localhost:9200', 'http://localhost:3001')}/logs/errors?hours={hours}&size=50"
-        response = requests.get(url, timeout=10)
+        url = f"{BACKEND_API_BASE}/logs/errors?hours={hours}&size=50"
+        response = await get_http_client().get(url, timeout=10)
         
         if response.status_code != 200:
             return f"Failed to fetch error logs: {response.status_code}"
         
-        logs = response.json()
+        logs = orjson.loads(response.content)
         
         if not logs:
             return f"No error or warning logs found in the last {hours} hours"
@@ -595,16 +631,15 @@ async def get_error_logs(hours: int = 24) -> str:
 async def search_logs(search_term: str, size: int = 20) -> str:
     """Search logs for specific terms or patterns"""
     try:
-        url = f"{OPENSEARCH_BASE_URL.replace('http://localhost:9200', 'http://localhost:3001')}/logs"
+        url = f"{BACKEND_API_BASE}/logs"
         params = {"search": search_term, "size": size}
         
-        search_params = "&".join([f"{k}={v}" for k, v in params.items()])
-        response = requests.get(f"{url}?{search_params}", timeout=10)
+        response = await get_http_client().get(url, params=params, timeout=10)
         
         if response.status_code != 200:
             return f"Failed to search logs: {response.status_code}"
         
-        logs = response.json()
+        logs = orjson.loads(response.content)
         
         if not logs:
             return f"No logs found matching '{search_term}'"
@@ -848,11 +883,10 @@ async def execute_network_playbook(
         full_command = " && ".join(ansible_commands)
         
         # Add debug information
-        print(f"=== ANSIBLE EXECUTION DEBUG ===")
-        print(f"Connecting to Ansible server: jack@192.168.0.131")
-        print(f"Target device: {target_device} -> {target_hosts}")
-        print(f"Playbook type: {playbook_type}")
-        print(f"Command length: {len(full_command)} characters")
+        logger.debug(
+            "Running %s playbook on %s -> %s via jack@192.168.0.131 (command length %d)",
+            playbook_type, target_device, target_hosts, len(full_command)
+        )
         
         # Execute on Ansible server via SSH
         ssh_result = await execute_ssh_command(
@@ -862,10 +896,11 @@ async def execute_network_playbook(
             command=full_command
         )
         
-        print(f"SSH Result: success={ssh_result.get('success', False)}")
-        print(f"SSH Exit Code: {ssh_result.get('exit_code', 'N/A')}")
-        print(f"SSH Output Length: {len(ssh_result.get('output', ''))}")
-        print(f"SSH Error Length: {len(ssh_result.get('error', ''))}")
+        logger.debug(
+            "SSH result: success=%s, exit code %s, output length %d, error length %d",
+            ssh_result.get('success', False), ssh_result.get('exit_code', 'N/A'),
+            len(ssh_result.get('output', '')), len(ssh_result.get('error', ''))
+        )
         
         if not ssh_result["success"]:
             error_details = {
@@ -1,5 +1,6 @@
-import json
 import asyncio
+import msgpack
+import orjson
 from typing import Dict, Set, Any, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime, UTC
@@ -7,6 +8,31 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Clients that offer this WebSocket subprotocol get msgpack binary frames
+# instead of JSON text frames
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# Message timestamps only need ~100ms precision, so the ISO string is
+# refreshed on a timer instead of formatted for every message
+CLOCK_INTERVAL = 0.1
+_clock_iso = datetime.now(UTC).isoformat()
+
+def now_iso() -> str:
+    """Current UTC time as ISO 8601, accurate to CLOCK_INTERVAL"""
+    return _clock_iso
+
+def start_clock():
+    """Keep now_iso() fresh; call once from the running event loop"""
+    global _clock_iso
+    _clock_iso = datetime.now(UTC).isoformat()
+    asyncio.get_running_loop().call_later(CLOCK_INTERVAL, start_clock)
+
+def encode_message(data: Dict[str, Any], binary: bool):
+    """Encode a message as msgpack bytes or JSON text"""
+    if binary:
+        return msgpack.packb(data, use_bin_type=True, default=str)
+    return orjson.dumps(data, default=str).decode()
+
 class ConnectionManager:
     """Manages WebSocket connections for real-time graph updates"""
     
@@ -18,7 +44,9 @@ class ConnectionManager:
     
     async def connect(self, websocket: WebSocket, session_id: str = "default"):
         """Accept a new WebSocket connection"""
-        await websocket.accept()
+        offered = websocket.headers.get("sec-websocket-protocol", "")
+        binary = MSGPACK_SUBPROTOCOL in (protocol.strip() for protocol in offered.split(","))
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
         
         if session_id not in self.active_connections:
             self.active_connections[session_id] = set()
@@ -27,7 +55,8 @@ class ConnectionManager:
         self.connection_metadata[websocket] = {
             "session_id": session_id,
             "connected_at": datetime.now(UTC),
-            "last_ping": datetime.now(UTC)
+            "last_ping": datetime.now(UTC),
+            "binary": binary
         }
         
         logger.info(f"WebSocket connected for session {session_id}")
@@ -36,7 +65,7 @@ class ConnectionManager:
         await self.send_to_connection(websocket, {
             "type": "connection_established",
             "session_id": session_id,
-            "timestamp": datetime.now(UTC).isoformat()
+            "timestamp": now_iso()
         })
     
     def disconnect(self, websocket: WebSocket):
@@ -55,10 +84,35 @@ class ConnectionManager:
             
             logger.info(f"WebSocket disconnected for session {session_id}")
     
+    def is_binary(self, websocket: WebSocket) -> bool:
+        """Whether the connection negotiated the msgpack subprotocol"""
+        metadata = self.connection_metadata.get(websocket)
+        return bool(metadata and metadata["binary"])
+    
+    async def _send_encoded(self, websocket: WebSocket, payload):
+        if isinstance(payload, bytes):
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+    
+    async def receive(self, websocket: WebSocket) -> Dict[str, Any]:
+        """Receive and decode one message in the connection's format"""
+        if self.is_binary(websocket):
+            return msgpack.unpackb(await websocket.receive_bytes(), raw=False)
+        return orjson.loads(await websocket.receive_text())
+    
+    async def send_encoded(self, websocket: WebSocket, payload):
+        """Send a payload already encoded with encode_message"""
+        try:
+            await self._send_encoded(websocket, payload)
+        except Exception as e:
+            logger.error(f"Error sending to WebSocket: {e}")
+            self.disconnect(websocket)
+    
     async def send_to_connection(self, websocket: WebSocket, data: Dict[str, Any]):
         """Send data to a specific WebSocket connection"""
         try:
-            await websocket.send_text(json.dumps(data))
+            await self._send_encoded(websocket, encode_message(data, self.is_binary(websocket)))
         except Exception as e:
             logger.error(f"Error sending to WebSocket: {e}")
             self.disconnect(websocket)
@@ -67,9 +121,15 @@ class ConnectionManager:
         """Send data to all connections in a session"""
         if session_id in self.active_connections:
             disconnected = []
+            # Encoded at most once per format, however many connections there are
+            encoded = {}
             for websocket in self.active_connections[session_id]:
                 try:
-                    await websocket.send_text(json.dumps(data))
+                    binary = self.is_binary(websocket)
+                    payload = encoded.get(binary)
+                    if payload is None:
+                        payload = encoded[binary] = encode_message(data, binary)
+                    await self._send_encoded(websocket, payload)
                 except Exception as e:
                     logger.error(f"Error sending to WebSocket in session {session_id}: {e}")
                     disconnected.append(websocket)
@@ -94,7 +154,7 @@ class ConnectionManager:
             "entity_type": entity_type,  # node, edge
             "entity_data": entity_data,
             "source": source,
-            "timestamp": datetime.now(UTC).isoformat()
+            "timestamp": now_iso()
         }
         
         await self.broadcast(update_message)
@@ -106,7 +166,7 @@ class ConnectionManager:
             "type": "graph_state",
             "nodes": nodes,
             "edges": edges,
-            "timestamp": datetime.now(UTC).isoformat()
+            "timestamp": now_iso()
         }
         
         await self.send_to_session(session_id, state_message)
@@ -115,7 +175,7 @@ class ConnectionManager:
         """Send ping to all connections to keep them alive"""
         ping_message = {
             "type": "ping",
-            "timestamp": datetime.now(UTC).isoformat()
+            "timestamp": now_iso()
         }
         
         await self.broadcast(ping_message)
@@ -130,9 +190,3 @@ class ConnectionManager:
 
 # Global connection manager instance
 connection_manager = ConnectionManager()
-
-async def periodic_ping():
-    """Periodic task to ping all connections"""
-    while True:
-        await asyncio.sleep(30)  # Ping every 30 seconds
-        await connection_manager.ping_connections() 
\ No newline at end of file